@@ -108,6 +108,16 @@ def build_exe():
             'datetime',
             'webbrowser',
             'ctypes',
+            'steam_core',
+            'steam_core.paths',
+            'steam_core.config',
+            'steam_core.auth',
+            'steam_core.api',
+            'steam_core.vault',
+            'steam_core.backup',
+            'steam_core.watcher',
+            'steam_core.accounts',
+            'steam_core.server',
         ]
         
         for imp in hidden_imports:
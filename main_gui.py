@@ -1,23 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
+import math
 import os
-import base64
-import hmac
-import hashlib
 import time
-import struct
-import requests
 from threading import Thread
-from PIL import Image, ImageTk, ImageOps, ImageDraw, ImageFont
+from PIL import Image, ImageTk, ImageDraw, ImageFont
 import threading
-import io
-import shutil
 from datetime import datetime
 import sys
 import webbrowser
 import ctypes
 import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from steam_core.config import ConfigManager
+from steam_core.auth import SteamAuth
+from steam_core.api import SteamAPI, AvatarPrefetcher
+from steam_core.accounts import AccountManager, AccountRecord, AccountDecryptor
+from steam_core.watcher import AccountsWatcher
 
 def set_windows_taskbar_icon():
     """Установка иконки для панели задач Windows"""
@@ -48,304 +49,302 @@ def resource_path(relative_path):
                 return alt_path
     return full_path
 
-def get_app_directory():
-    """Получить путь к директории приложения (рядом с EXE)"""
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)
-    else:
-        return os.path.abspath(".")
 
-class ConfigManager:
+class AccountSearchIndex:
+    """Индекс поиска по имени аккаунта, SteamID и никнейму: подстрока (и префикс) через триграммы"""
+    NGRAM = 3
+
     def __init__(self):
-        self.app_dir = get_app_directory()
-        self.config_file = os.path.join(self.app_dir, "config.json")
-        self.config = self.load_config()
-
-    def load_config(self):
-        """Загрузка конфигурации из файла"""
-        default_config = {
-            "steam_api_key": "",
-            "window_geometry": "1100x750"
-        }
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return {**default_config, **config}
-            except Exception as e:
-                print(f"Ошибка загрузки конфигурации: {e}")
-                return default_config
+        self._texts = {}
+        self._grams = {}
+        self._version = 0
+        self._cache_query = None
+        self._cache_result = None
+        self._cache_version = -1
+
+    @classmethod
+    def _ngrams(cls, text):
+        return {text[i:i + cls.NGRAM] for i in range(len(text) - cls.NGRAM + 1)}
+
+    def update(self, acc_id, fields):
+        """Добавление или обновление полей аккаунта в индексе"""
+        # Разделитель не встречается в запросах, поэтому совпадения не пересекают границу полей
+        text = '\x00'.join(str(field).lower() for field in fields if field)
+        if self._texts.get(acc_id) == text:
+            return
+        self.remove(acc_id)
+        self._texts[acc_id] = text
+        for gram in self._ngrams(text):
+            self._grams.setdefault(gram, set()).add(acc_id)
+        self._version += 1
+
+    def remove(self, acc_id):
+        """Удаление аккаунта из индекса"""
+        text = self._texts.pop(acc_id, None)
+        if text is None:
+            return
+        for gram in self._ngrams(text):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(acc_id)
+                if not ids:
+                    del self._grams[gram]
+        self._version += 1
+
+    @staticmethod
+    def normalize(query):
+        return (query or '').strip().lower()
+
+    def matches(self, acc_id, query):
+        """Проверка одного аккаунта на совпадение с запросом"""
+        return self.normalize(query) in self._texts.get(acc_id, '')
+
+    def search(self, query):
+        """Множество подходящих аккаунтов или None для пустого запроса"""
+        query = self.normalize(query)
+        if not query:
+            return None
+        if (self._cache_query and self._cache_version == self._version
+                and query.startswith(self._cache_query)):
+            # Пользователь дописал символы: ищем только среди прошлых результатов
+            candidates = self._cache_result
+        elif len(query) >= self.NGRAM:
+            gram_sets = sorted((self._grams.get(gram, set()) for gram in self._ngrams(query)), key=len)
+            candidates = set(gram_sets[0])
+            for ids in gram_sets[1:]:
+                candidates &= ids
+                if not candidates:
+                    break
         else:
-            return default_config
+            candidates = self._texts.keys()
+        texts = self._texts
+        result = {acc_id for acc_id in candidates if query in texts[acc_id]}
+        self._cache_query = query
+        self._cache_result = result
+        self._cache_version = self._version
+        return result
 
-    def save_config(self):
-        """Сохранение конфигурации в файл"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Ошибка сохранения конфигурации: {e}")
-            return False
+class AccountListModel:
+    """Модель списка аккаунтов: порядок строк, фильтр поиска и уведомления подписчиков"""
+    def __init__(self):
+        self.accounts = {}
+        self.all_order = []
+        self.order = self.all_order
+        self.nicknames = {}
+        self.search_index = AccountSearchIndex()
+        # Без активного фильтра индекс не нужен: аккаунты индексируются при простое или первом поиске
+        self._unindexed = set()
+        self.query = ''
+        self._query_ids = None
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """Подписка на события listener(event, acc_ids), event: add / remove / change / reset"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Отписка от событий модели"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event, acc_ids):
+        if not acc_ids and event != 'reset':
+            return
+        for listener in self._listeners:
+            listener(event, acc_ids)
 
-    def get_api_key(self):
-        """Получить API ключ"""
-        return self.config.get("steam_api_key", "")
-
-    def set_api_key(self, api_key):
-        """Установить API ключ"""
-        self.config["steam_api_key"] = api_key
-        return self.save_config()
-
-    def get_window_geometry(self):
-        """Получить геометрию окна"""
-        return self.config.get("window_geometry", "1100x750")
-
-    def set_window_geometry(self, geometry):
-        """Установить геометрию окна"""
-        self.config["window_geometry"] = geometry
-        return self.save_config()
-
-class SteamAuth:
-    def generate_2fa_code(self, shared_secret):
-        """Генерация 2FA кода"""
-        try:
-            timestamp = int(time.time()) // 30
-            key = base64.b64decode(shared_secret + '===')
-            message = struct.pack('>Q', timestamp)
-            hmac_result = hmac.new(key, message, hashlib.sha1).digest()
-            start = hmac_result[19] & 0x0F
-            code_int = struct.unpack('>I', hmac_result[start:start+4])[0] & 0x7FFFFFFF
-            chars = '23456789BCDFGHJKMNPQRTVWXY'
-            code = ''
-            for _ in range(5):
-                code += chars[code_int % len(chars)]
-                code_int //= len(chars)
-            return code
-        except Exception as e:
-            return f"Error: {str(e)}"
+    def __len__(self):
+        return len(self.order)
 
-class SteamAPI:
-    def __init__(self, config_manager):
-        self.config_manager = config_manager
-        self.api_key = self.config_manager.get_api_key()
+    def __contains__(self, acc_id):
+        return acc_id in self.accounts
 
-    def set_api_key(self, api_key):
-        """Установить API ключ"""
-        self.api_key = api_key
-        self.config_manager.set_api_key(api_key)
+    def get(self, acc_id):
+        return self.accounts.get(acc_id)
 
-    def get_steam_avatar(self, steamid):
-        """Получение аватара аккаунта Steam через официальный API"""
-        if not self.api_key:
-            return None
-        try:
-            app_dir = get_app_directory()
-            cache_dir = os.path.join(app_dir, "accounts", "avatars")
-            cache_path = os.path.join(cache_dir, f"{steamid}.jpg")
-            if os.path.exists(cache_path):
-                file_time = os.path.getmtime(cache_path)
-                if time.time() - file_time < 24 * 3600:
-                    try:
-                        image = Image.open(cache_path)
-                        return image
-                    except Exception as e:
-                        print(f"Ошибка загрузки аватара из кэша: {e}")
-                        try:
-                            os.remove(cache_path)
-                        except:
-                            pass
-            url = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-            params = {
-                'key': self.api_key,
-                'steamids': steamid
-            }
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                players = data.get('response', {}).get('players', [])
-                if players:
-                    player_info = players[0]
-                    avatar_urls = [
-                        player_info.get('avatarfull', ''),
-                        player_info.get('avatarmedium', ''),
-                        player_info.get('avatar', '')
-                    ]
-                    avatar_url = next((url for url in avatar_urls if url), '')
-                    if avatar_url:
-                        if avatar_url.endswith('.jpg'):
-                            png_url = avatar_url.replace('.jpg', '.png')
-                            try:
-                                img_response = requests.get(png_url, timeout=10)
-                                if img_response.status_code == 200:
-                                    avatar_url = png_url
-                            except:
-                                pass
-                        img_response = requests.get(avatar_url, timeout=10)
-                        if img_response.status_code == 200:
-                            os.makedirs(cache_dir, exist_ok=True)
-                            file_extension = '.png' if '.png' in avatar_url else '.jpg'
-                            cache_path = os.path.join(cache_dir, f"{steamid}{file_extension}")
-                            with open(cache_path, 'wb') as f:
-                                f.write(img_response.content)
-                            image_data = img_response.content
-                            image = Image.open(io.BytesIO(image_data))
-                            if image.mode in ('RGBA', 'LA', 'P'):
-                                image = image.convert('RGB')
-                            return image
-            return None
-        except Exception as e:
-            print(f"Ошибка получения аватара: {e}")
-            return None
+    def index(self, acc_id):
+        """Позиция аккаунта в отображаемом списке (ValueError, если его нет)"""
+        return self.order.index(acc_id)
 
-    def get_player_info(self, steamid):
-        """Получение дополнительной информации об игроке"""
-        if not self.api_key:
-            return None
-        try:
-            url = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-            params = {
-                'key': self.api_key,
-                'steamids': steamid
-            }
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                players = data.get('response', {}).get('players', [])
-                if players:
-                    return players[0]
-            return None
-        except Exception as e:
-            print(f"Ошибка получения информации: {e}")
-            return None
+    def is_visible(self, acc_id):
+        """Проходит ли аккаунт текущий фильтр"""
+        return acc_id in self.accounts and (self._query_ids is None or acc_id in self._query_ids)
 
-    def validate_api_key(self):
-        """Проверка валидности API ключа"""
-        if not self.api_key:
-            return False, "API ключ не установлен"
-        try:
-            url = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
-            params = {
-                'key': self.api_key,
-                'steamids': '76561197960435530'
-            }
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                return True, "API ключ валиден"
+    def _index_account(self, acc_id):
+        if self._query_ids is None:
+            self._unindexed.add(acc_id)
+            return
+        self._index_now(acc_id)
+
+    def _index_now(self, acc_id):
+        account = self.accounts[acc_id]
+        steamid = str(account.get('steamid') or '')
+        self.search_index.update(acc_id, (account.get('account_name', acc_id), steamid,
+                                          self.nicknames.get(steamid)))
+
+    def _apply_changes(self, removed, added, changed):
+        """Обновление индекса и отображаемого порядка, рассылка событий"""
+        for acc_id in removed:
+            self._unindexed.discard(acc_id)
+            self.search_index.remove(acc_id)
+        for acc_id in added + changed:
+            self._index_account(acc_id)
+        if self._query_ids is None:
+            self._emit('remove', removed)
+            self._emit('add', added)
+            self._emit('change', changed)
+            return
+        old_visible = set(self.order)
+        self._query_ids.difference_update(removed)
+        for acc_id in added + changed:
+            if self.search_index.matches(acc_id, self.query):
+                self._query_ids.add(acc_id)
             else:
-                return False, f"Ошибка API: {response.status_code}"
-        except Exception as e:
-            return False, f"Ошибка проверки API ключа: {e}"
-
-class AccountManager:
-    def __init__(self, accounts_dir="accounts"):
-        app_dir = get_app_directory()
-        self.accounts_dir = os.path.join(app_dir, accounts_dir)
-        os.makedirs(self.accounts_dir, exist_ok=True)
-        avatars_dir = os.path.join(self.accounts_dir, "avatars")
-        os.makedirs(avatars_dir, exist_ok=True)
-        self.auth = SteamAuth()
-
-    def set_steam_api(self, steam_api):
-        """Установить Steam API instance"""
-        self.steam_api = steam_api
-
-    def extract_steamid_from_mafile(self, account_data):
-        """Автоматическое извлечение SteamID из данных maFile"""
-        try:
-            steamid = None
-            if 'Session' in account_data and 'SteamID' in account_data['Session']:
-                steamid = str(account_data['Session']['SteamID'])
-            elif 'steamid' in account_data:
-                steamid = str(account_data['steamid'])
-            elif 'Session' in account_data and 'SteamLogin' in account_data['Session']:
-                steam_login = account_data['Session']['SteamLogin']
-                if '%7C%7C' in steam_login:
-                    steamid = steam_login.split('%7C%7C')[0]
-            elif 'account_name' in account_data and account_data['account_name'].isdigit():
-                steamid = account_data['account_name']
-            return steamid
-        except Exception as e:
-            print(f"Ошибка извлечения SteamID: {e}")
-            return None
+                self._query_ids.discard(acc_id)
+        self.order = [acc_id for acc_id in self.all_order if acc_id in self._query_ids]
+        self._emit('remove', removed)
+        if set(self.order) != old_visible:
+            # Добавленные строки тоже попадают в reset, отдельное событие add не нужно
+            self._emit('reset', self.order)
+        self._emit('change', [acc_id for acc_id in changed if acc_id in self._query_ids])
+
+    def set_accounts(self, accounts):
+        """Замена всего набора аккаунтов с рассылкой только реальных изменений"""
+        removed = [acc_id for acc_id in self.all_order if acc_id not in accounts]
+        added = [acc_id for acc_id in accounts if acc_id not in self.accounts]
+        changed = [acc_id for acc_id, account in accounts.items()
+                   if acc_id in self.accounts and self.accounts[acc_id] != account]
+        for acc_id in removed:
+            del self.accounts[acc_id]
+        removed_set = set(removed)
+        self.all_order[:] = [acc_id for acc_id in self.all_order if acc_id not in removed_set] + added
+        self.accounts.update(accounts)
+        self._apply_changes(removed, added, changed)
+
+    def update_accounts(self, accounts):
+        """Добавление и обновление нескольких аккаунтов без удаления остальных"""
+        added = [acc_id for acc_id in accounts if acc_id not in self.accounts]
+        changed = [acc_id for acc_id, account in accounts.items()
+                   if acc_id in self.accounts and self.accounts[acc_id] != account]
+        self.all_order.extend(added)
+        self.accounts.update(accounts)
+        self._apply_changes([], added, changed)
+
+    def upsert(self, acc_id, account):
+        """Добавление или обновление одного аккаунта"""
+        if acc_id not in self.accounts:
+            self.accounts[acc_id] = account
+            self.all_order.append(acc_id)
+            self._apply_changes([], [acc_id], [])
+        elif self.accounts[acc_id] != account:
+            self.accounts[acc_id] = account
+            self._apply_changes([], [], [acc_id])
+
+    def remove(self, acc_id):
+        """Удаление аккаунта из списка"""
+        if acc_id in self.accounts:
+            del self.accounts[acc_id]
+            self.all_order.remove(acc_id)
+            if self.order is not self.all_order and acc_id in self.order:
+                self.order.remove(acc_id)
+            self._apply_changes([acc_id], [], [])
+
+    def remove_accounts(self, acc_ids):
+        """Удаление нескольких аккаунтов одним обновлением"""
+        removed = [acc_id for acc_id in acc_ids if acc_id in self.accounts]
+        if not removed:
+            return
+        for acc_id in removed:
+            del self.accounts[acc_id]
+        removed_set = set(removed)
+        self.all_order[:] = [acc_id for acc_id in self.all_order if acc_id not in removed_set]
+        if self.order is not self.all_order:
+            self.order = [acc_id for acc_id in self.order if acc_id not in removed_set]
+        self._apply_changes(removed, [], [])
+
+    def index_pending(self, limit=None):
+        """Индексация отложенных аккаунтов (не больше limit за вызов); возвращает остаток"""
+        while self._unindexed and limit != 0:
+            acc_id = self._unindexed.pop()
+            if acc_id in self.accounts:
+                self._index_now(acc_id)
+            if limit is not None:
+                limit -= 1
+        return len(self._unindexed)
+
+    def set_nicknames(self, nicknames):
+        """Никнеймы {steamid: nickname} для поиска"""
+        self.nicknames.update(nicknames)
+        affected = [acc_id for acc_id, account in self.accounts.items()
+                    if str(account.get('steamid') or '') in nicknames]
+        for acc_id in affected:
+            self._index_account(acc_id)
+        if self._query_ids is not None and affected:
+            self._apply_changes([], [], affected)
+
+    def set_query(self, query):
+        """Фильтрация списка по строке поиска (пустая строка снимает фильтр)"""
+        query = self.search_index.normalize(query)
+        if query == self.query:
+            return
+        if query:
+            self.index_pending()
+        self.query = query
+        self._query_ids = self.search_index.search(query)
+        if self._query_ids is None:
+            self.order = self.all_order
+        else:
+            self.order = [acc_id for acc_id in self.all_order if acc_id in self._query_ids]
+        self._emit('reset', self.order)
 
-    def load_all_accounts(self):
-        """Загрузка всех аккаунтов из maFiles"""
-        accounts = {}
-        if not os.path.exists(self.accounts_dir):
-            print(f"Директория {self.accounts_dir} не существует")
-            return accounts
-        for filename in os.listdir(self.accounts_dir):
-            if filename.endswith('.maFile'):
-                file_path = os.path.join(self.accounts_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        account_data = json.load(f)
-                    account_id = filename.replace('.maFile', '')
-                    if 'steamid' not in account_data or not account_data.get('steamid'):
-                        steamid = self.extract_steamid_from_mafile(account_data)
-                        if steamid:
-                            account_data['steamid'] = steamid
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                json.dump(account_data, f, indent=4, ensure_ascii=False)
-                    accounts[account_id] = account_data
-                    print(f"Загружен аккаунт: {account_id}")
-                except Exception as e:
-                    print(f"Ошибка загрузки {filename}: {e}")
-        print(f"Всего загружено аккаунтов: {len(accounts)}")
-        return accounts
-
-    def import_mafile(self, file_path):
-        """Импорт maFile с автоматическим извлечением SteamID"""
+class StartupTimer:
+    """Замер этапов запуска; фоновые этапы (загрузка maFiles, проверка ключа) идут параллельно"""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        # {этап: [начало, конец]} в секундах от создания таймера
+        self.phases = OrderedDict()
+
+    def begin(self, name):
+        self.phases[name] = [time.perf_counter() - self.origin, None]
+
+    def end(self, name):
+        phase = self.phases.get(name)
+        if phase is not None and phase[1] is None:
+            phase[1] = time.perf_counter() - self.origin
+
+    def mark(self, name):
+        """Мгновенное событие (например, первое отображение окна)"""
+        if name not in self.phases:
+            self.begin(name)
+            self.end(name)
+
+    @contextmanager
+    def measure(self, name):
+        self.begin(name)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                account_data = json.load(f)
-            steamid = self.extract_steamid_from_mafile(account_data)
-            if steamid:
-                account_data['steamid'] = steamid
-            account_name = account_data.get('account_name', 'unknown')
-            new_filename = f"{account_name}.maFile"
-            new_path = os.path.join(self.accounts_dir, new_filename)
-            with open(new_path, 'w', encoding='utf-8') as f:
-                json.dump(account_data, f, indent=4, ensure_ascii=False)
-            steamid_info = f" (SteamID: {steamid})" if steamid else ""
-            return True, f"Аккаунт {account_name}{steamid_info} импортирован!"
-        except Exception as e:
-            return False, f"Ошибка импорта: {e}"
+            yield
+        finally:
+            self.end(name)
 
-    def export_mafile(self, account_data, file_path):
-        """Экспорт maFile"""
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(account_data, f, indent=4, ensure_ascii=False)
-            return True, "maFile успешно экспортирован"
-        except Exception as e:
-            return False, f"Ошибка экспорта: {e}"
+    def is_finished(self, names):
+        return all(name in self.phases and self.phases[name][1] is not None for name in names)
 
-    def backup_accounts(self):
-        """Создание резервной копии всех аккаунтов"""
-        try:
-            app_dir = get_app_directory()
-            backup_dir = os.path.join(app_dir, "backups", f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-            os.makedirs(backup_dir, exist_ok=True)
-            for filename in os.listdir(self.accounts_dir):
-                if filename.endswith('.maFile'):
-                    src = os.path.join(self.accounts_dir, filename)
-                    dst = os.path.join(backup_dir, filename)
-                    shutil.copy2(src, dst)
-            avatars_src = os.path.join(self.accounts_dir, "avatars")
-            avatars_dst = os.path.join(backup_dir, "avatars")
-            if os.path.exists(avatars_src):
-                shutil.copytree(avatars_src, avatars_dst)
-            return True, f"Резервная копия создана: {backup_dir}"
-        except Exception as e:
-            return False, f"Ошибка создания резервной копии: {e}"
+    def report(self):
+        """Таблица этапов: начало от старта и длительность в миллисекундах"""
+        lines = ["Этапы запуска:            начало, мс  длительность, мс"]
+        for name, (start, finish) in self.phases.items():
+            duration = "..." if finish is None else f"{(finish - start) * 1000:.1f}"
+            lines.append(f"  {name:<24}{start * 1000:10.1f}{duration:>18}")
+        return "\n".join(lines)
 
 class IconManager:
     """Менеджер для управления иконками приложения"""
     _instance = None
     _icons_loaded = False
     _icons = {}
+    _photo_image = None
+    # Версия рисунка в именах файлов кэша: при изменении рисунка старые файлы не используются
+    ICON_CACHE_VERSION = 1
 
     def __new__(cls):
         if cls._instance is None:
@@ -382,44 +381,61 @@ class IconManager:
             self.create_temp_icons()
             self._icons_loaded = True
 
+    @staticmethod
+    def render_icon(size):
+        """Рисование иконки приложения заданного размера (RGBA)"""
+        icon = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(icon)
+        # Рисуем круг
+        margin = max(1, size // 16)
+        draw.ellipse([margin, margin, size - margin, size - margin], 
+                    fill='#66c0f4', outline='#1b2838', width=max(1, size // 16))
+        # Добавляем текст
+        try:
+            font_size = max(8, size // 2)
+            font = ImageFont.truetype("arial.ttf", font_size)
+        except:
+            try:
+                font = ImageFont.truetype("Arial", font_size)
+            except:
+                font = ImageFont.load_default()
+        text = "S"
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        x = (size - text_width) // 2
+        y = (size - text_height) // 2 - size // 16
+        draw.text((x, y), text, fill='#1b2838', font=font)
+        return icon
+
+    def get_cached_icon_path(self, size, extension):
+        """Путь к сгенерированной иконке во временном каталоге"""
+        return os.path.join(tempfile.gettempdir(),
+                            f'steam_manager_icon_{size}_v{self.ICON_CACHE_VERSION}.{extension}')
+
+    def save_cached_icon(self, size):
+        """Рисование иконки и сохранение в кэш в форматах ICO и PNG (атомарно)"""
+        icon = self.render_icon(size)
+        # Конвертируем в RGB для ICO
+        rgb_icon = Image.new('RGB', (size, size), (255, 255, 255))
+        rgb_icon.paste(icon, mask=icon.split()[3] if icon.mode == 'RGBA' else None)
+        for image, extension, image_format in ((rgb_icon, 'ico', 'ICO'), (icon, 'png', 'PNG')):
+            path = self.get_cached_icon_path(size, extension)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            image.save(temp_path, format=image_format)
+            os.replace(temp_path, path)
+
     def create_temp_icons(self):
-        """Создание временных иконок в памяти"""
+        """Временные иконки: рисуются только при первом запуске, дальше берутся из кэша"""
         try:
             sizes = [16, 32, 64]
             for size in sizes:
-                # Создаем временную иконку в памяти
-                icon = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(icon)
-                # Рисуем круг
-                margin = max(1, size // 16)
-                draw.ellipse([margin, margin, size - margin, size - margin], 
-                            fill='#66c0f4', outline='#1b2838', width=max(1, size // 16))
-                # Добавляем текст
-                try:
-                    font_size = max(8, size // 2)
-                    font = ImageFont.truetype("arial.ttf", font_size)
-                except:
-                    try:
-                        font = ImageFont.truetype("Arial", font_size)
-                    except:
-                        font = ImageFont.load_default()
-                text = "S"
-                bbox = draw.textbbox((0, 0), text, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                x = (size - text_width) // 2
-                y = (size - text_height) // 2 - size // 16
-                draw.text((x, y), text, fill='#1b2838', font=font)
-                # Сохраняем временную иконку в файл
-                temp_dir = tempfile.gettempdir()
-                temp_icon_path = os.path.join(temp_dir, f'steam_manager_icon_{size}.ico')
-                # Конвертируем в RGB для ICO
-                rgb_icon = Image.new('RGB', (size, size), (255, 255, 255))
-                rgb_icon.paste(icon, mask=icon.split()[3] if icon.mode == 'RGBA' else None)
-                rgb_icon.save(temp_icon_path)
+                temp_icon_path = self.get_cached_icon_path(size, 'ico')
+                if not (os.path.exists(temp_icon_path) and os.path.exists(self.get_cached_icon_path(size, 'png'))):
+                    self.save_cached_icon(size)
+                    print(f"Создана временная иконка: {temp_icon_path}")
                 self._icons[f'icon_{size}'] = temp_icon_path
-                print(f"Создана временная иконка: {temp_icon_path}")
-            print("Временные иконки созданы")
+            print("Временные иконки готовы")
         except Exception as e:
             print(f"Ошибка создания временных иконок: {e}")
 
@@ -428,41 +444,47 @@ class IconManager:
         icon_key = f'icon_{size}'
         return self._icons.get(icon_key)
 
+    def get_photo_image(self):
+        """Иконка для wm_iconphoto: PNG из кэша читается Tk без Pillow, объект переиспользуется окнами"""
+        if self._photo_image is None:
+            png_path = self.get_cached_icon_path(32, 'png')
+            try:
+                if not os.path.exists(png_path):
+                    self.save_cached_icon(32)
+                photo_image = tk.PhotoImage(file=png_path)
+            except Exception as e:
+                # Tk без поддержки PNG или недоступный временный каталог
+                print(f"Иконка из кэша недоступна: {e}")
+                photo_image = ImageTk.PhotoImage(self.render_icon(32))
+            IconManager._photo_image = photo_image
+        return self._photo_image
+
     def set_window_icon(self, window):
         """Установить иконку для окна"""
         try:
             print("Установка иконки для окна...")
-            # Пробуем установить иконку через iconbitmap (для ICO файлов)
-            icon_sizes = [64, 32, 48, 16, 128, 256]
-            for size in icon_sizes:
-                icon_path = self.get_icon_path(size)
-                if icon_path and os.path.exists(icon_path):
-                    try:
-                        window.iconbitmap(icon_path)
-                        print(f"Иконка установлена из файла: {icon_path}")
-                        return True
-                    except Exception as e:
-                        print(f"Ошибка установки иконки из файла {icon_path}: {e}")
-                        continue
-            print("Не удалось установить иконку из файлов, пробуем создать временную...")
-            # Создаем иконку на лету
+            # iconbitmap принимает ICO только на Windows, на X11 и macOS сразу используем wm_iconphoto
+            if os.name == 'nt':
+                icon_sizes = [64, 32, 48, 16, 128, 256]
+                for size in icon_sizes:
+                    icon_path = self.get_icon_path(size)
+                    if icon_path and os.path.exists(icon_path):
+                        try:
+                            window.iconbitmap(icon_path)
+                            print(f"Иконка установлена из файла: {icon_path}")
+                            return True
+                        except Exception as e:
+                            print(f"Ошибка установки иконки из файла {icon_path}: {e}")
+                            continue
             try:
-                icon = Image.new('RGBA', (32, 32), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(icon)
-                draw.ellipse([2, 2, 30, 30], fill='#66c0f4', outline='#1b2838', width=2)
-                try:
-                    font = ImageFont.truetype("arial.ttf", 16)
-                except:
-                    font = ImageFont.load_default()
-                draw.text((10, 6), "S", fill='#1b2838', font=font)
-                photo_image = ImageTk.PhotoImage(icon)
+                photo_image = self.get_photo_image()
                 window.wm_iconphoto(True, photo_image)
                 # Сохраняем ссылку чтобы не удалилась сборщиком мусора
                 window._icon = photo_image
-                print("Иконка установлена из памяти")
+                print("Иконка установлена из кэша")
                 return True
             except Exception as e:
-                print(f"Ошибка установки иконки из памяти: {e}")
+                print(f"Ошибка установки иконки из кэша: {e}")
                 return False
         except Exception as e:
             print(f"Общая ошибка установки иконки: {e}")
@@ -635,6 +657,60 @@ class ApiKeyDialog(CustomDialog):
         self.dialog.wait_window()
         return self.result
 
+class PasswordDialog(CustomDialog):
+    def __init__(self, parent, title, message, confirm=False):
+        super().__init__(parent, title, 450, 260 if confirm else 220)
+        self.confirm = confirm
+        self.setup_ui(message)
+
+    def setup_ui(self, message):
+        info_label = tk.Label(self.main_frame, text=message,
+                             bg='#1b2838', fg='#c7d5e0', font=('Arial', 10),
+                             justify=tk.LEFT, wraplength=400)
+        info_label.pack(pady=(0, 15))
+        self.password_entry = self.create_password_row("Пароль:")
+        self.confirm_entry = self.create_password_row("Повтор:") if self.confirm else None
+        buttons_frame = tk.Frame(self.main_frame, bg='#1b2838')
+        buttons_frame.pack(fill=tk.X, pady=(10, 0))
+        cancel_btn = self.create_button(buttons_frame, "Отмена",
+                                        command=self.dialog.destroy, style="normal")
+        cancel_btn.pack(side=tk.LEFT)
+        ok_btn = self.create_button(buttons_frame, "OK",
+                                    command=self.submit, style="accent")
+        ok_btn.pack(side=tk.RIGHT)
+        self.password_entry.focus_set()
+        self.dialog.bind('<Return>', lambda e: self.submit())
+        self.dialog.bind('<Escape>', lambda e: self.dialog.destroy())
+
+    def create_password_row(self, label):
+        row = tk.Frame(self.main_frame, bg='#1b2838')
+        row.pack(fill=tk.X, pady=5)
+        tk.Label(row, text=label, width=8, anchor='w', bg='#1b2838', fg='#c7d5e0',
+                 font=('Arial', 9)).pack(side=tk.LEFT)
+        entry = tk.Entry(row, show='*', width=36, font=('Arial', 9),
+                         bg='#2a475e', fg='#c7d5e0', insertbackground='#c7d5e0', relief='flat')
+        entry.pack(side=tk.LEFT, padx=(10, 0), fill=tk.X, expand=True)
+        return entry
+
+    def highlight(self, entry):
+        entry.config(bg='#5a2e2e')
+        self.dialog.after(1000, lambda: entry.config(bg='#2a475e'))
+
+    def submit(self):
+        password = self.password_entry.get()
+        if not password:
+            self.highlight(self.password_entry)
+            return
+        if self.confirm_entry is not None and self.confirm_entry.get() != password:
+            self.highlight(self.confirm_entry)
+            return
+        self.result = password
+        self.dialog.destroy()
+
+    def show(self):
+        self.dialog.wait_window()
+        return self.result
+
 class AccountStatusDialog(CustomDialog):
     def __init__(self, parent, status_info):
         super().__init__(parent, "Статус аккаунта", 450, 250)
@@ -669,15 +745,334 @@ class AccountStatusDialog(CustomDialog):
         # Фокус на кнопке
         ok_btn.focus_set()
 
+class TreeAccountList:
+    """Таблица аккаунтов: строка Treeview на каждый аккаунт, правятся только изменившиеся ячейки"""
+    # Для обновления всех строк нужна полная таблица кодов
+    FULL_TABLE = True
+
+    def __init__(self, parent, model, headings, row_values, on_select=None, on_scroll=None):
+        self.model = model
+        self.columns = tuple(headings)
+        self.row_values = row_values
+        self.on_scroll = on_scroll
+        self._row_cells = {}
+        self.tree = ttk.Treeview(parent, columns=self.columns, show='headings',
+                                 height=15, style="Steam.Treeview")
+        for column, (text, width, anchor) in headings.items():
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor=anchor)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        if on_select:
+            self.tree.bind('<<TreeviewSelect>>', on_select)
+        self.model.subscribe(self.on_model_event)
+        self._insert_rows(self.model.order)
+
+    def destroy(self):
+        """Удаление виджетов и отписка от модели"""
+        self.model.unsubscribe(self.on_model_event)
+        self.tree.destroy()
+        self.scrollbar.destroy()
+
+    def _insert_rows(self, acc_ids):
+        for acc_id in acc_ids:
+            values = self.row_values(acc_id)
+            self.tree.insert('', tk.END, iid=acc_id, values=values)
+            self._row_cells[acc_id] = values
+
+    def on_model_event(self, event, acc_ids):
+        """Применение событий модели: вставка, удаление и правка отдельных ячеек"""
+        if event == 'remove':
+            existing = [acc_id for acc_id in acc_ids if self.tree.exists(acc_id)]
+            if existing:
+                self.tree.delete(*existing)
+            for acc_id in acc_ids:
+                self._row_cells.pop(acc_id, None)
+        elif event == 'add':
+            self._insert_rows(acc_ids)
+        elif event == 'change':
+            for acc_id in acc_ids:
+                self.update_row(acc_id, self.row_values(acc_id))
+        elif event == 'reset':
+            self._apply_filter(acc_ids)
+
+    def _apply_filter(self, acc_ids):
+        """Показ только отфильтрованных строк: скрытые отсоединяются, а не удаляются"""
+        visible = set(acc_ids)
+        hidden = [acc_id for acc_id in self._row_cells if acc_id not in visible]
+        if hidden:
+            self.tree.detach(*hidden)
+        self._insert_rows([acc_id for acc_id in acc_ids if acc_id not in self._row_cells])
+        for index, acc_id in enumerate(acc_ids):
+            self.tree.move(acc_id, '', index)
+            self.update_row(acc_id, self.row_values(acc_id))
+
+    def update_row(self, acc_id, values):
+        """Обновление только тех ячеек строки, значения которых изменились"""
+        old_values = self._row_cells.get(acc_id)
+        if old_values == values or not self.tree.exists(acc_id):
+            return
+        for index, column in enumerate(self.columns):
+            if old_values is None or old_values[index] != values[index]:
+                self.tree.set(acc_id, column, values[index])
+        self._row_cells[acc_id] = values
+
+    def refresh(self):
+        """Пересчет значений всех строк (например, на новом временном шаге)"""
+        for acc_id in self.model.order:
+            self.update_row(acc_id, self.row_values(acc_id))
+
+    def selection_ids(self):
+        """Выбранные аккаунты"""
+        return list(self.tree.selection())
+
+    def select(self, acc_id):
+        """Выделение аккаунта с прокруткой к нему (скрытые поиском аккаунты не выделяются)"""
+        if self.model.is_visible(acc_id) and self.tree.exists(acc_id):
+            self.tree.selection_set(acc_id)
+            self.tree.focus(acc_id)
+            self.tree.see(acc_id)
+
+    def visible_ids(self):
+        """Аккаунты, строки которых сейчас видны"""
+        # identify_row(1) попадает в строку заголовков (show='headings'), поэтому окно
+        # видимых строк считается по yview: доли прокрутки от числа присоединенных строк
+        items = self.tree.get_children()
+        if not items:
+            return []
+        first, last = self.tree.yview()
+        start = int(first * len(items))
+        end = min(len(items), int(math.ceil(last * len(items))))
+        return list(items[start:end])
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.on_scroll:
+            self.on_scroll()
+
+class VirtualAccountList:
+    """Виртуализированная таблица: фиксированное окно строк, привязываемых к модели при прокрутке"""
+    # Значения вычисляются только для видимых строк
+    FULL_TABLE = False
+    ROW_HEIGHT = 22
+    HEADER_HEIGHT = 26
+    WHEEL_ROWS = 3
+
+    def __init__(self, parent, model, headings, row_values, on_select=None, on_scroll=None):
+        self.model = model
+        self.columns = tuple(headings)
+        self.row_values = row_values
+        self.on_select = on_select
+        self.on_scroll = on_scroll
+        self.offset = 0
+        self.slots = 15
+        self.slot_ids = []
+        self._slot_cells = []
+        self.selected = set()
+        self.anchor_id = None
+        self._extend_selection = False
+        self.tree = ttk.Treeview(parent, columns=self.columns, show='headings',
+                                 height=self.slots, style="Steam.Treeview")
+        for column, (text, width, anchor) in headings.items():
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor=anchor)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<ButtonPress-1>', self._on_click, add='+')
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll_rows(-self.WHEEL_ROWS))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_rows(self.WHEEL_ROWS))
+        for key, delta in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'),
+                           ('<Next>', 'page_down'), ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda e, d=delta: self.move_selection(d))
+        self.model.subscribe(self.on_model_event)
+        self.render()
+
+    def destroy(self):
+        """Удаление виджетов и отписка от модели"""
+        self.model.unsubscribe(self.on_model_event)
+        self.tree.destroy()
+        self.scrollbar.destroy()
+
+    def on_model_event(self, event, acc_ids):
+        """Изменения модели: перерисовка окна, если затронуты видимые строки"""
+        if event == 'remove':
+            self.selected.difference_update(acc_ids)
+        elif event == 'reset':
+            self.offset = 0
+        if event == 'change' and not set(acc_ids) & set(self.slot_ids):
+            return
+        self.render()
+
+    def refresh(self):
+        """Пересчет значений только видимых строк"""
+        self.render()
+
+    def render(self):
+        """Привязка строк окна к аккаунтам модели начиная с текущего смещения"""
+        order = self.model.order
+        self.offset = max(0, min(self.offset, len(order) - self.slots))
+        visible = order[self.offset:self.offset + self.slots]
+        for index in range(len(self.slot_ids), len(visible)):
+            self.tree.insert('', tk.END, iid=f"slot{index}", values=())
+            self._slot_cells.append(None)
+        for index in range(len(visible), len(self.slot_ids)):
+            self.tree.delete(f"slot{index}")
+        del self._slot_cells[len(visible):]
+        for index, acc_id in enumerate(visible):
+            values = self.row_values(acc_id)
+            if self._slot_cells[index] != values:
+                self.tree.item(f"slot{index}", values=values)
+                self._slot_cells[index] = values
+        self.slot_ids = list(visible)
+        self.tree.selection_set([f"slot{index}" for index, acc_id in enumerate(visible)
+                                 if acc_id in self.selected])
+        if order:
+            self.scrollbar.set(self.offset / len(order),
+                               min(1.0, (self.offset + self.slots) / len(order)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        """Установка смещения окна"""
+        offset = max(0, min(int(offset), len(self.model.order) - self.slots))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+            if self.on_scroll:
+                self.on_scroll()
+
+    def scroll_rows(self, delta):
+        self.scroll_to(self.offset + delta)
+        return "break"
+
+    def on_scrollbar(self, action, value, unit=None):
+        """Команда полосы прокрутки: moveto или scroll на строки/страницы"""
+        if action == 'moveto':
+            self.scroll_to(float(value) * len(self.model.order))
+        elif action == 'scroll':
+            step = self.slots if unit == 'pages' else 1
+            self.scroll_to(self.offset + int(value) * step)
+
+    def _on_mousewheel(self, event):
+        return self.scroll_rows(-int(event.delta / 120) * self.WHEEL_ROWS)
+
+    def _on_configure(self, event):
+        slots = max(1, (event.height - self.HEADER_HEIGHT) // self.ROW_HEIGHT)
+        if slots != self.slots:
+            self.slots = slots
+            self.tree.configure(height=slots)
+            self.render()
+
+    def _on_click(self, event):
+        # Ctrl/Shift: выделение дополняется и не теряет строки за пределами окна
+        self._extend_selection = bool(event.state & 0x0005)
+
+    def _on_tree_select(self, event):
+        slot_selection = set()
+        for slot in self.tree.selection():
+            index = int(slot[4:])
+            if index < len(self.slot_ids):
+                slot_selection.add(self.slot_ids[index])
+        visible = set(self.slot_ids)
+        if slot_selection == self.selected & visible:
+            return
+        if self._extend_selection:
+            self.selected = (self.selected - visible) | slot_selection
+        else:
+            self.selected = slot_selection
+        focus = self.tree.focus()
+        if focus and int(focus[4:]) < len(self.slot_ids):
+            self.anchor_id = self.slot_ids[int(focus[4:])]
+        if self.on_select:
+            self.on_select(event)
+
+    def move_selection(self, delta):
+        """Перемещение выделения клавишами с прокруткой окна"""
+        order = self.model.order
+        if not order:
+            return "break"
+        try:
+            index = self.model.index(self.anchor_id)
+        except ValueError:
+            index = self.offset - 1 if delta in (1, 'page_down') else self.offset
+        if delta == 'page_up':
+            index -= self.slots
+        elif delta == 'page_down':
+            index += self.slots
+        elif delta == 'home':
+            index = 0
+        elif delta == 'end':
+            index = len(order) - 1
+        else:
+            index += delta
+        self.select(order[max(0, min(index, len(order) - 1))])
+        if self.on_select:
+            self.on_select(None)
+        return "break"
+
+    def selection_ids(self):
+        """Выбранные аккаунты в порядке списка"""
+        if len(self.selected) <= 1:
+            return list(self.selected)
+        return [acc_id for acc_id in self.model.order if acc_id in self.selected]
+
+    def select(self, acc_id):
+        """Выделение аккаунта с прокруткой к нему (скрытые поиском аккаунты не выделяются)"""
+        if not self.model.is_visible(acc_id):
+            return
+        self.selected = {acc_id}
+        self.anchor_id = acc_id
+        index = self.model.index(acc_id)
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.slots:
+            self.offset = index - self.slots + 1
+        self.render()
+        slot = f"slot{self.slot_ids.index(acc_id)}"
+        self.tree.focus(slot)
+
+    def visible_ids(self):
+        """Аккаунты, строки которых сейчас видны"""
+        return list(self.slot_ids)
+
 class SteamManagerGUI:
-    def __init__(self, root):
+    AVATAR_SIZE = 120
+    AVATAR_BORDER = 3
+    TREE_HEADINGS = OrderedDict([
+        ('account_name', ('Имя аккаунта', 220, 'w')),
+        ('steamid', ('SteamID', 200, 'w')),
+        ('2fa_code', ('2FA Код', 120, 'center')),
+        ('status', ('Статус', 150, 'center')),
+    ])
+    # Запас после границы шага и упреждение предрасчета кодов следующего шага
+    REFRESH_MARGIN_MS = 20
+    PRECOMPUTE_LEAD_MS = 1000
+
+    # Отчет о запуске печатается, когда завершены эти фоновые этапы
+    STARTUP_REPORT_PHASES = ("Загрузка maFiles", "Проверка API ключа")
+    ICON_RETRY_MS = 500
+    SEARCH_INDEX_BATCH = 1000
+    # Счетчики пересчитываются не чаще раза в интервал, а не на каждое событие модели
+    STATS_UPDATE_MS = 100
+    ICON_ATTEMPTS = 3
+
+    def __init__(self, root, startup_timer=None):
         self.root = root
+        self.startup_timer = startup_timer or StartupTimer()
+        self._startup_reported = False
         # Устанавливаем иконку для панели задач Windows ДО создания GUI
         if os.name == 'nt':  # Windows
             print("Установка AppUserModelID для Windows...")
             set_windows_taskbar_icon()
         # Инициализация конфигурации
-        self.config_manager = ConfigManager()
+        with self.startup_timer.measure("Конфигурация"):
+            self.config_manager = ConfigManager()
         self.root.title("Steam Account Manager")
         self.root.geometry(self.config_manager.get_window_geometry())
         self.root.configure(bg='#1b2838')
@@ -685,33 +1080,100 @@ class SteamManagerGUI:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         # Инициализация менеджера иконок и установка иконки
         print("Инициализация менеджера иконок...")
-        self.icon_manager = IconManager()
-        # Пытаемся установить иконку несколько раз
-        icon_set = False
-        for attempt in range(3):
-            if self.icon_manager.set_window_icon(self.root):
-                icon_set = True
-                break
-            print(f"Попытка {attempt + 1} установки иконки не удалась, повторяем...")
-            time.sleep(0.5)
-        if not icon_set:
-            print("ВНИМАНИЕ: Не удалось установить иконку приложения")
+        with self.startup_timer.measure("Иконки"):
+            self.icon_manager = IconManager()
+            # Повторные попытки идут по таймеру и не задерживают показ окна
+            if not self.icon_manager.set_window_icon(self.root):
+                self.root.after(self.ICON_RETRY_MS, self.retry_window_icon, self.ICON_ATTEMPTS - 1)
+        self.startup_timer.begin("Интерфейс")
         self.set_steam_theme()
         # Инициализация API и менеджера аккаунтов
         self.steam_api = SteamAPI(self.config_manager)
         self.account_manager = AccountManager()
         self.account_manager.set_steam_api(self.steam_api)
         self.auth = SteamAuth()
-        self.accounts = {}
+        self.auth.secret_resolver = self.request_account_secret
+        self.code_server = None
+        self.account_decryptor = AccountDecryptor(self.account_manager, self._on_account_decrypted)
+        self.account_model = AccountListModel()
+        self.account_model.subscribe(self.on_model_event)
+        # Общий словарь с моделью: модель изменяет его на месте
+        self.accounts = self.account_model.accounts
         self.current_account = None
-        self.avatar_images = {}
+        self.avatar_images = OrderedDict()
+        self._avatar_overlay = None
         self.current_account_id = None
         self.player_nicknames = {}
+        self.player_profiles = {}
+        self.stats_text = ""
+        self._stats_update_pending = False
+        self.avatar_prefetcher = AvatarPrefetcher(
+            self.steam_api,
+            max_workers=self.config_manager.get_setting("avatar_prefetch_workers"),
+            on_progress=self._on_avatar_prefetched)
+        self._scroll_prioritize_job = None
+        self._search_job = None
+        self._load_generation = 0
+        self._backup_running = False
+        self.accounts_watcher = None
         self.setup_ui()
-        self.load_accounts()
+        self._refresh_pending = False
+        self.root.bind('<Map>', self.on_window_map, add='+')
         self.auto_refresh()
+        self.tick_countdown()
+        self.startup_timer.end("Интерфейс")
+        # Окно отрисовывается первым, аккаунты и проверка ключа - следующими этапами
+        self.root.after_idle(self.start_accounts_stage)
+
+    def retry_window_icon(self, attempts_left):
+        """Повторная установка иконки окна"""
+        if self.icon_manager.set_window_icon(self.root):
+            return
+        if attempts_left > 1:
+            self.root.after(self.ICON_RETRY_MS, self.retry_window_icon, attempts_left - 1)
+        else:
+            print("ВНИМАНИЕ: Не удалось установить иконку приложения")
+
+    def start_accounts_stage(self):
+        """Второй этап запуска: список из манифеста, затем фоновая проверка maFiles"""
+        # Список из манифеста показываем сразу, изменения maFiles догружаем после отрисовки окна
+        with self.startup_timer.measure("Список из манифеста"):
+            self.load_accounts(from_manifest=True)
+        self.startup_timer.begin("Загрузка maFiles")
+        self.root.after_idle(self.load_accounts)
+        if self.account_manager.vault.is_encrypted():
+            self.root.after_idle(self.unlock_vault)
+        if self.config_manager.get_setting("accounts_watcher"):
+            self.accounts_watcher = AccountsWatcher(
+                self.account_manager.accounts_dir, self._on_account_files_changed,
+                poll_interval=float(self.config_manager.get_setting("accounts_poll_interval")))
+            self.accounts_watcher.start()
+        if self.config_manager.get_setting("code_server"):
+            self.start_code_server()
         # Проверяем API ключ при запуске
-        self.check_api_key_on_startup()
+        self.root.after_idle(self.check_api_key_on_startup)
+
+    def end_startup_phase(self, name):
+        """Завершение фонового этапа запуска; после последнего печатается отчет"""
+        self.startup_timer.end(name)
+        if not self._startup_reported and self.startup_timer.is_finished(self.STARTUP_REPORT_PHASES):
+            self._startup_reported = True
+            print(self.startup_timer.report())
+
+    def start_code_server(self):
+        """Локальный сервер кодов для ботов (включается параметром code_server в config.json)"""
+        from steam_core.server import CodeServer
+        try:
+            self.code_server = CodeServer(
+                self.auth, self.config_manager.get_code_server_token(),
+                host=self.config_manager.get_setting("code_server_host"),
+                port=int(self.config_manager.get_setting("code_server_port")),
+                unix_socket=self.config_manager.get_setting("code_server_socket") or None)
+            self.code_server.set_accounts(self.accounts)
+            self.code_server.start()
+        except (OSError, ValueError) as e:
+            self.code_server = None
+            print(f"Ошибка запуска сервера кодов: {e}")
 
     def show_info_dialog(self, title, message):
         """Показать информационное диалоговое окно"""
@@ -730,6 +1192,7 @@ class SteamManagerGUI:
             self.steam_api.set_api_key(api_key)
             success, message = self.steam_api.validate_api_key()
             if success:
+                self.config_manager.set_api_key_validated(api_key)
                 self.info_label.config(text="API ключ успешно сохранен и проверен")
             else:
                 self.show_info_dialog("Ошибка", f"Неверный API ключ: {message}")
@@ -737,18 +1200,37 @@ class SteamManagerGUI:
                 self.show_api_key_dialog()
 
     def check_api_key_on_startup(self):
-        """Проверка API ключа при запуске"""
+        """Проверка API ключа при запуске: в фоне и только если ключ давно не проверялся"""
         api_key = self.config_manager.get_api_key()
+        self.startup_timer.begin("Проверка API ключа")
         if not api_key:
             self.show_api_key_dialog()
+        elif self.config_manager.is_api_key_validated(api_key):
+            print("API ключ недавно проверен, повторная проверка пропущена")
         else:
-            success, message = self.steam_api.validate_api_key()
-            if not success:
-                self.info_label.config(text=f"Ошибка API ключа: {message}")
+            Thread(target=self._validate_api_key_thread, args=(api_key,), daemon=True).start()
+            return
+        self.end_startup_phase("Проверка API ключа")
+
+    def _validate_api_key_thread(self, api_key):
+        success, message = self.steam_api.validate_api_key()
+        self.root.after(0, self.finish_api_key_validation, api_key, success, message)
+
+    def finish_api_key_validation(self, api_key, success, message):
+        if success:
+            self.config_manager.set_api_key_validated(api_key)
+        else:
+            self.info_label.config(text=f"Ошибка API ключа: {message}")
+        self.end_startup_phase("Проверка API ключа")
 
     def on_closing(self):
         """Сохранение геометрии окна при закрытии"""
         self.config_manager.set_window_geometry(self.root.geometry())
+        if self.accounts_watcher:
+            self.accounts_watcher.stop()
+        if self.code_server:
+            self.code_server.stop()
+        self.account_manager.close()
         self.root.destroy()
 
     def set_steam_theme(self):
@@ -771,6 +1253,7 @@ class SteamManagerGUI:
                        troughcolor=self.panel_color,
                        borderwidth=0)
         style.configure("Steam.Treeview",
+                       rowheight=VirtualAccountList.ROW_HEIGHT,
                        background=self.panel_color,
                        foreground=self.text_color,
                        fieldbackground=self.panel_color,
@@ -844,8 +1327,11 @@ class SteamManagerGUI:
         header_buttons = [
             ("API Key", self.manage_api_key),
             ("Импорт", self.import_mafile),
+            ("Импорт папки", self.import_directory),
             ("Обновить", self.load_accounts),
             ("Бэкап", self.create_backup),
+            ("Восстановить", self.restore_backup),
+            ("Шифрование", self.manage_vault),
         ]
         for text, command in header_buttons:
             btn = self.create_steam_button(header_buttons_frame, text, command, width=10, style="header")
@@ -865,27 +1351,23 @@ class SteamManagerGUI:
                               font=('Arial', 12, 'bold'))
         table_title.pack(side=tk.LEFT, padx=15, pady=10)
 
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', self.on_search_changed)
+        search_entry = tk.Entry(table_header, textvariable=self.search_var, width=24,
+                                font=('Arial', 10), bg=self.panel_color, fg=self.text_color,
+                                insertbackground=self.text_color, relief='flat')
+        search_entry.pack(side=tk.RIGHT, padx=(0, 15), pady=10)
+        search_entry.bind('<Escape>', lambda e: self.search_var.set(""))
+        search_label = tk.Label(table_header, text="🔍", bg=self.header_color,
+                                fg=self.text_color, font=('Arial', 10))
+        search_label.pack(side=tk.RIGHT, padx=(0, 5), pady=10)
+
         table_container = tk.Frame(left_panel, bg=self.panel_color)
         table_container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        columns = ('account_name', 'steamid', '2fa_code', 'status')
-        self.tree = ttk.Treeview(table_container, columns=columns, show='headings', 
-                                height=15, style="Steam.Treeview")
-        self.tree.heading('account_name', text='Имя аккаунта')
-        self.tree.heading('steamid', text='SteamID')
-        self.tree.heading('2fa_code', text='2FA Код')
-        self.tree.heading('status', text='Статус')
-        self.tree.column('account_name', width=220, anchor='w')
-        self.tree.column('steamid', width=200, anchor='w')
-        self.tree.column('2fa_code', width=120, anchor='center')
-        self.tree.column('status', width=150, anchor='center')
-
-        scrollbar = ttk.Scrollbar(table_container, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.tree.bind('<<TreeviewSelect>>', self.on_account_select)
+        self.table_container = table_container
+        self.account_list = None
+        self.build_account_list(self.config_manager.get_setting("virtual_list") is True)
 
         right_panel = tk.Frame(content_frame, bg=self.panel_color, width=300, relief='flat', bd=0)
         right_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=(15, 0))
@@ -932,6 +1414,10 @@ class SteamManagerGUI:
                                    font=('Arial', 10, 'bold'),
                                    justify=tk.LEFT, anchor='w')
         self.twofa_label.pack(side=tk.LEFT)
+        self.countdown_label = tk.Label(self.twofa_frame, text="",
+                                        bg=self.panel_color, fg=self.text_color,
+                                        font=('Arial', 9))
+        self.countdown_label.pack(side=tk.LEFT, padx=(8, 0))
         self.copy_twofa_btn = tk.Button(self.twofa_frame, text="📋", 
                                        bg=self.panel_color, fg=self.accent_color, 
                                        font=('Arial', 9),
@@ -1005,42 +1491,390 @@ class SteamManagerGUI:
         draw.text((42, 32), "S", fill=self.accent_color, font=font)
         return ImageTk.PhotoImage(image)
 
-    def load_accounts(self):
-        """Загрузка аккаунтов в таблицу"""
+    def load_accounts(self, from_manifest=False):
+        """Загрузка аккаунтов в таблицу (обновляются только изменившиеся строки)
+
+        from_manifest: показать список из манифеста, не читая maFiles; проверка файлов
+        выполняется следующим вызовом load_accounts()
+        """
         print("Начало загрузки аккаунтов...")
-        self.accounts = self.account_manager.load_all_accounts()
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        active_count = 0
-        for acc_id, account in self.accounts.items():
-            account_name = account.get('account_name', acc_id)
-            steamid = account.get('steamid', 'Авто-поиск...')
-            twofa = self.auth.generate_2fa_code(account.get('shared_secret', ''))
-            if not account.get('shared_secret'):
-                status = "❌ Нет секрета"
-            elif not account.get('identity_secret'):
-                status = "⚠️ Нет identity"
+        self.avatar_prefetcher.cancel()
+        # Результаты прежней загрузки, если она еще идет, больше не нужны
+        self._load_generation += 1
+        if from_manifest:
+            self.apply_loaded_accounts(self.account_manager.load_manifest_accounts(), prefetch=False)
+            return
+        self.info_label.config(text="Загрузка аккаунтов...")
+        threading.Thread(target=self._load_accounts_thread, args=(self._load_generation,),
+                         daemon=True).start()
+
+    def _load_accounts_thread(self, generation):
+        """Разбор maFiles пулом потоков, готовые аккаунты передаются в UI пачками"""
+        try:
+            accounts, errors = self.account_manager.load_all_accounts(
+                max_workers=self.config_manager.get_setting("account_load_workers"),
+                chunk_size=int(self.config_manager.get_setting("account_load_chunk_size")),
+                on_chunk=lambda chunk: self.root.after(0, self.merge_loaded_accounts, generation, chunk))
+        except Exception as e:
+            accounts, errors = None, {self.account_manager.accounts_dir: str(e)}
+        self.root.after(0, self.finish_accounts_load, generation, accounts, errors)
+
+    def merge_loaded_accounts(self, generation, chunk):
+        """Пачка загруженных аккаунтов: добавление и обновление строк без удаления остальных"""
+        if generation != self._load_generation:
+            return
+        for acc_id, account in chunk.items():
+            self.update_account_secret(acc_id, account)
+        self.ensure_list_mode(len(self.accounts) + sum(1 for acc_id in chunk if acc_id not in self.accounts))
+        self.account_model.update_accounts(chunk)
+        if self.code_server:
+            self.code_server.update_accounts(chunk)
+
+    def finish_accounts_load(self, generation, accounts, errors):
+        """Завершение фоновой загрузки: удаление пропавших аккаунтов и отчет об ошибках"""
+        if generation != self._load_generation:
+            return
+        if accounts is not None:
+            self.apply_loaded_accounts(accounts)
+        self.end_startup_phase("Загрузка maFiles")
+        self.index_search_when_idle()
+        if errors:
+            self.show_load_errors(errors)
+
+    def index_search_when_idle(self):
+        """Индекс поиска строится пачками между событиями окна; первый поиск доиндексирует остаток"""
+        if self.account_model.index_pending(self.SEARCH_INDEX_BATCH):
+            self.root.after(1, self.index_search_when_idle)
+
+    def _on_account_files_changed(self, changed, removed):
+        """Изменения maFiles от наблюдателя (поток наблюдателя): разбор только затронутых файлов"""
+        if changed is None:
+            self.root.after(0, self.load_accounts)
+            return
+        accounts, errors = self.account_manager.load_account_files(changed)
+        removed_ids = [filename[:-len('.maFile')] for filename in removed]
+        self.root.after(0, self.apply_account_changes, accounts, removed_ids, errors)
+
+    def apply_account_changes(self, accounts, removed_ids, errors):
+        """Применение изменений каталога к модели одним обновлением на пачку"""
+        for acc_id in removed_ids:
+            self.auth.remove_secret(acc_id)
+        self.account_model.remove_accounts(removed_ids)
+        # Перезапись файла без изменения полей (например, дописанный SteamID) строк не трогает
+        accounts = {acc_id: account for acc_id, account in accounts.items()
+                    if self.accounts.get(acc_id) != account}
+        for acc_id, account in accounts.items():
+            self.update_account_secret(acc_id, account)
+        self.account_model.update_accounts(accounts)
+        if self.code_server:
+            self.code_server.remove_accounts(removed_ids)
+            self.code_server.update_accounts(accounts)
+        self.ensure_list_mode(len(self.accounts))
+        if self.current_account_id is None or self.current_account_id not in self.account_model:
+            if self.account_model.order:
+                self.account_list.select(self.account_model.order[0])
+                self.on_account_select(None)
             else:
-                status = "✅ Активен"
-                active_count += 1
-            self.tree.insert('', tk.END, values=(account_name, steamid, twofa, status), tags=(acc_id,))
+                self.current_account_id = None
+                self.current_account = None
+                self.clear_account_info()
+        if accounts:
+            self.prefetch_player_summaries()
+        if errors:
+            self.show_load_errors(errors)
+        elif accounts or removed_ids:
+            self.info_label.config(text=f"Обновлено из каталога: {len(accounts)}, удалено: {len(removed_ids)}")
+
+    def show_load_errors(self, errors, limit=15):
+        """Отчет о файлах, которые не удалось загрузить"""
+        lines = [f"{filename}: {error}" for filename, error in sorted(errors.items())[:limit]]
+        if len(errors) > limit:
+            lines.append(f"... и еще {len(errors) - limit}")
+        self.info_label.config(text=f"Загружено аккаунтов: {len(self.accounts)}, ошибок: {len(errors)}")
+        self.show_info_dialog("Ошибки загрузки", "Не удалось загрузить файлы:\n\n" + "\n".join(lines))
+
+    def update_account_secret(self, acc_id, account):
+        """Секрет аккаунта для генерации кодов; зашифрованные ждут расшифровки"""
+        current = self.accounts.get(acc_id)
+        if account.locked:
+            self.auth.remove_secret(acc_id)
+        elif current is None or current.locked or current.shared_secret != account.shared_secret:
+            self.auth.set_secret(acc_id, account.shared_secret or '')
+
+    def request_account_secret(self, acc_id):
+        """Запрос кода зашифрованного аккаунта: расшифровка maFile в фоне"""
+        account = self.accounts.get(acc_id)
+        if account is not None and account.locked and self.account_manager.vault.unlocked:
+            self.account_decryptor.request(acc_id, account)
+
+    def _on_account_decrypted(self, acc_id, record, fields, error):
+        self.root.after(0, self.apply_decrypted_account, acc_id, record, fields, error)
+
+    def apply_decrypted_account(self, acc_id, record, fields, error):
+        """Подстановка расшифрованных полей в строку аккаунта"""
+        current = self.accounts.get(acc_id)
+        if current is None or current.path != record.path or not current.locked:
+            return
+        if error:
+            print(f"Ошибка расшифровки {acc_id}: {error}")
+            return
+        account = AccountRecord.from_fields(current.path, dict(fields, encrypted=True),
+                                            self.account_manager.vault)
+        self.update_account_secret(acc_id, account)
+        self.account_model.upsert(acc_id, account)
+        # Код сервер берет из SteamAuth сам, индекс меняется только с именем или SteamID
+        if self.code_server and (account.account_name, account.steamid) != (current.account_name, current.steamid):
+            self.code_server.update_accounts({acc_id: account})
+
+    def unlock_vault(self):
+        """Запрос пароля зашифрованного хранилища"""
+        vault = self.account_manager.vault
+        if vault.unlocked:
+            return True
+        if not vault.is_available():
+            self.show_info_dialog("Ошибка", "Для зашифрованных maFiles установите пакет cryptography")
+            return False
+        while True:
+            password = PasswordDialog(self.root, "Зашифрованные maFiles",
+                                      "maFiles зашифрованы. Введите пароль для генерации кодов:").show()
+            if not password:
+                self.info_label.config(text="Хранилище заблокировано: коды недоступны")
+                return False
+            if self.account_manager.unlock_vault(password):
+                break
+            self.show_info_dialog("Ошибка", "Неверный пароль")
+        self.info_label.config(text="Хранилище разблокировано")
+        self.account_decryptor.cancel()
+        self.account_list.refresh()
+        if self.current_account:
+            self.update_code_display()
+        return True
+
+    def manage_vault(self):
+        """Шифрование maFiles паролем или разблокировка уже зашифрованных"""
+        vault = self.account_manager.vault
+        if vault.is_encrypted() and not vault.unlocked:
+            self.unlock_vault()
+            return
+        if not vault.is_available():
+            self.show_info_dialog("Ошибка", "Для шифрования maFiles установите пакет cryptography")
+            return
+        if vault.is_encrypted() and not any(not account.encrypted for account in self.accounts.values()):
+            self.show_info_dialog("Шифрование", "Все maFiles уже зашифрованы, хранилище разблокировано")
+            return
+        password = PasswordDialog(self.root, "Шифрование maFiles",
+                                  "maFiles будут зашифрованы в формате Steam Desktop Authenticator. "
+                                  "Без пароля восстановить их будет невозможно.", confirm=True).show()
+        if not password:
+            return
+        if vault.is_encrypted() and not self.account_manager.unlock_vault(password):
+            self.show_info_dialog("Ошибка", "Пароль не совпадает с паролем хранилища")
+            return
+        self.info_label.config(text="Шифрование maFiles...")
+        Thread(target=self._encrypt_vault_thread, args=(password,), daemon=True).start()
 
+    def _encrypt_vault_thread(self, password, limit=15):
+        try:
+            count, errors = self.account_manager.encrypt_vault(password)
+            message = f"Зашифровано maFiles: {count}"
+            if errors:
+                message += f"\nПропущено из-за ошибок: {len(errors)}\n" + "\n".join(
+                    f"{filename}: {error}" for filename, error in sorted(errors.items())[:limit])
+        except Exception as e:
+            count, message = 0, f"Ошибка шифрования: {e}"
+        self.root.after(0, self.finish_vault_encryption, count, message)
+
+    def finish_vault_encryption(self, count, message):
+        self.info_label.config(text=message.splitlines()[0])
+        self.show_info_dialog("Шифрование" if count else "Ошибка", message)
+        if count:
+            self.load_accounts()
+
+    def apply_loaded_accounts(self, accounts, prefetch=True):
+        """Замена набора аккаунтов в модели и восстановление выбора"""
+        self.account_decryptor.cancel()
+        self.auth.load_secrets({acc_id: account.get('shared_secret', '')
+                                for acc_id, account in accounts.items() if not account.locked})
+        self.ensure_list_mode(len(accounts))
+        self.account_model.set_accounts(accounts)
+        if self.code_server:
+            self.code_server.set_accounts(accounts)
         self.info_label.config(text=f"Загружено аккаунтов: {len(self.accounts)}")
-        self.stats_label.config(text=f"Активных: {active_count} | Всего: {len(self.accounts)}")
 
-        if self.accounts:
-            first_item = self.tree.get_children()[0]
-            self.tree.selection_set(first_item)
-            self.tree.focus(first_item)
+        if self.current_account_id in self.account_model:
+            self.account_list.select(self.current_account_id)
+            self.on_account_select(None)
+        elif self.account_model.order:
+            self.account_list.select(self.account_model.order[0])
             self.on_account_select(None)
         else:
+            self.current_account_id = None
+            self.current_account = None
             self.clear_account_info()
+        if prefetch:
+            self.prefetch_player_summaries()
+
+    def build_account_list(self, virtual):
+        """Создание таблицы аккаунтов: обычной или виртуализированной"""
+        if self.account_list is not None:
+            self.account_list.destroy()
+        list_class = VirtualAccountList if virtual else TreeAccountList
+        self.account_list = list_class(self.table_container, self.account_model, self.TREE_HEADINGS,
+                                       self.get_row_values, on_select=self.on_account_select,
+                                       on_scroll=self.on_list_scroll)
+        print(f"Режим таблицы: {'виртуализированный' if virtual else 'обычный'}")
+
+    def ensure_list_mode(self, account_count):
+        """Переключение режима таблицы по настройке virtual_list (true / false / auto)"""
+        mode = self.config_manager.get_setting("virtual_list")
+        if mode is True or mode is False:
+            virtual = mode
+        else:
+            virtual = account_count >= int(self.config_manager.get_setting("virtual_list_threshold"))
+        if virtual != isinstance(self.account_list, VirtualAccountList):
+            self.build_account_list(virtual)
+
+    def on_model_event(self, event, acc_ids):
+        """События модели: обновление панели выбранного аккаунта и счетчиков"""
+        if event == 'change' and self.current_account_id in acc_ids:
+            self.current_account = self.accounts.get(self.current_account_id)
+            self.update_account_info()
+        self.schedule_stats_update()
+
+    def get_row_values(self, acc_id):
+        """Значения ячеек строки аккаунта"""
+        account = self.accounts[acc_id]
+        account_name = account.get('account_name', acc_id)
+        steamid = account.get('steamid', 'Авто-поиск...')
+        twofa = self.auth.get_code(acc_id) or "🔒"
+        status, _ = self.get_account_status(account)
+        return (account_name, steamid, twofa, status)
+
+    def get_account_status(self, account):
+        """Статус аккаунта и цвет для отображения"""
+        if account.locked:
+            return "🔒 Зашифрован", "#8f98a0"
+        elif not account.get('shared_secret'):
+            return "❌ Нет секрета", "#ff6b6b"
+        elif not account.get('has_identity_secret'):
+            return "⚠️ Нет identity", "#ffa726"
+        return "✅ Активен", "#66bb6a"
+
+    def schedule_stats_update(self):
+        """Отложенный пересчет счетчиков: все события за интервал дают один проход по аккаунтам"""
+        if not self._stats_update_pending:
+            self._stats_update_pending = True
+            self.root.after(self.STATS_UPDATE_MS, self.update_stats)
+
+    def update_stats(self):
+        """Обновление счетчиков активных и всех аккаунтов"""
+        self._stats_update_pending = False
+        active_count = sum(1 for account in self.accounts.values()
+                           if account.get('shared_secret') and account.get('has_identity_secret'))
+        self.stats_text = f"Активных: {active_count} | Всего: {len(self.accounts)}"
+        self.stats_label.config(text=self.stats_text)
+
+    def prefetch_player_summaries(self):
+        """Пакетная загрузка никнеймов и URL аватаров для всех аккаунтов"""
+        steamids = [account.get('steamid') for account in self.accounts.values()]
+        steamids = [str(steamid) for steamid in steamids
+                    if steamid and str(steamid) not in self.player_nicknames]
+        if not self.steam_api.api_key:
+            return
+        if not steamids:
+            self.start_avatar_prefetch()
+            return
+        Thread(target=self._prefetch_summaries_thread, args=(steamids,), daemon=True).start()
+
+    def _prefetch_summaries_thread(self, steamids):
+        """Поток для пакетной загрузки информации о профилях"""
+        try:
+            summaries = self.steam_api.get_player_summaries(steamids)
+            for steamid, player_info in summaries.items():
+                self.player_nicknames[steamid] = player_info.get('personaname', 'Неизвестен')
+                self.player_profiles[steamid] = player_info
+            print(f"Загружено профилей пакетно: {len(summaries)} из {len(steamids)}")
+            nicknames = {steamid: self.player_nicknames[steamid] for steamid in summaries}
+            self.root.after(0, lambda: self.account_model.set_nicknames(nicknames))
+            current_steamid = self.current_account.get('steamid') if self.current_account else None
+            if current_steamid and str(current_steamid) in summaries:
+                nickname = self.player_nicknames[str(current_steamid)]
+                self.root.after(0, lambda: self.update_nickname(current_steamid, nickname))
+        except Exception as e:
+            print(f"Ошибка пакетной загрузки профилей: {e}")
+        self.root.after(0, self.start_avatar_prefetch)
+
+    def get_visible_steamids(self):
+        """SteamID аккаунтов, строки которых сейчас видны в таблице"""
+        steamids = []
+        for acc_id in self.account_list.visible_ids():
+            account = self.accounts.get(acc_id)
+            if account and account.get('steamid'):
+                steamids.append(str(account.steamid))
+        return steamids
+
+    def start_avatar_prefetch(self):
+        """Фоновая загрузка недостающих аватаров: сначала видимые строки"""
+        pending = []
+        seen = set()
+        for account in self.accounts.values():
+            steamid = str(account.get('steamid') or '')
+            player_info = self.player_profiles.get(steamid)
+            if (player_info and steamid not in seen
+                    and self.steam_api.is_avatar_stale(steamid, player_info)):
+                seen.add(steamid)
+                pending.append(steamid)
+        if not pending:
+            return
+        visible = [steamid for steamid in self.get_visible_steamids() if steamid in seen]
+        visible_set = set(visible)
+        ordered = visible + [steamid for steamid in pending if steamid not in visible_set]
+        self.avatar_prefetcher.start(ordered, self.player_profiles)
+        self.stats_label.config(text=f"{self.stats_text} | Аватары: 0/{len(ordered)}")
+
+    def _on_avatar_prefetched(self, steamid, path, done, total):
+        """Колбэк рабочего потока предзагрузки аватаров"""
+        self.root.after(0, lambda: self.update_prefetch_progress(steamid, path, done, total))
+
+    def update_prefetch_progress(self, steamid, path, done, total):
+        """Обновление прогресса предзагрузки аватаров в UI"""
+        if done >= total:
+            self.stats_label.config(text=self.stats_text)
+        else:
+            self.stats_label.config(text=f"{self.stats_text} | Аватары: {done}/{total}")
+        if path and self.current_account and str(self.current_account.get('steamid')) == steamid:
+            self.load_avatar(steamid)
+
+    def on_list_scroll(self):
+        """Прокрутка таблицы: приоритет предзагрузки для видимых строк"""
+        if self._scroll_prioritize_job:
+            self.root.after_cancel(self._scroll_prioritize_job)
+        self._scroll_prioritize_job = self.root.after(150, self._prioritize_visible_avatars)
+
+    def _prioritize_visible_avatars(self):
+        self._scroll_prioritize_job = None
+        self.avatar_prefetcher.prioritize(self.get_visible_steamids())
+
+    def on_search_changed(self, *args):
+        """Ввод в строке поиска: фильтрация после короткой паузы"""
+        if self._search_job:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(120, self.apply_search)
+
+    def apply_search(self):
+        """Фильтрация таблицы по имени аккаунта, SteamID или никнейму"""
+        self._search_job = None
+        self.account_model.set_query(self.search_var.get())
+        if self.account_model.query:
+            self.info_label.config(text=f"Найдено аккаунтов: {len(self.account_model)} из {len(self.accounts)}")
+        else:
+            self.info_label.config(text=f"Загружено аккаунтов: {len(self.accounts)}")
+        self.on_list_scroll()
 
     def on_account_select(self, event):
-        selection = self.tree.selection()
+        selection = self.account_list.selection_ids()
         if selection:
-            item = selection[0]
-            acc_id = self.tree.item(item, 'tags')[0]
+            acc_id = selection[0]
             self.current_account_id = acc_id
             self.current_account = self.accounts.get(acc_id)
             if self.current_account:
@@ -1054,26 +1888,12 @@ class SteamManagerGUI:
 
         account_name = self.current_account.get('account_name', 'Неизвестно')
         steamid = self.current_account.get('steamid', 'Не найден')
-        twofa_code = self.auth.generate_2fa_code(self.current_account.get('shared_secret', ''))
-        
+
         self.account_name_label.config(text=f"Аккаунт: {account_name}")
         self.steamid_label.config(text=f"SteamID: {steamid}")
-        self.twofa_label.config(text=f"2FA Code: {twofa_code}")
+        self.update_code_display()
 
-        if twofa_code and not twofa_code.startswith("Error"):
-            self.copy_twofa_btn.pack(side=tk.RIGHT)
-        else:
-            self.copy_twofa_btn.pack_forget()
-
-        if not self.current_account.get('shared_secret'):
-            status = "❌ Нет секрета"
-            color = "#ff6b6b"
-        elif not self.current_account.get('identity_secret'):
-            status = "⚠️ Нет identity"
-            color = "#ffa726"
-        else:
-            status = "✅ Активен"
-            color = "#66bb6a"
+        status, color = self.get_account_status(self.current_account)
         self.status_label.config(text=f"Статус: {status}", fg=color)
 
         if steamid and steamid != 'Не найден' and steamid != 'Авто-поиск...':
@@ -1113,6 +1933,7 @@ class SteamManagerGUI:
 
     def update_nickname(self, steamid, nickname):
         """Обновление никнейма в UI"""
+        self.account_model.set_nicknames({str(steamid): nickname})
         if self.current_account and self.current_account.get('steamid') == steamid:
             self.nickname_label.config(text=f"Никнейм: {nickname}")
 
@@ -1120,7 +1941,7 @@ class SteamManagerGUI:
         """Копирование 2FA кода при клике на иконку (без всплывающих окон)"""
         if not self.current_account:
             return
-        twofa_code = self.auth.generate_2fa_code(self.current_account.get('shared_secret', ''))
+        twofa_code = self.auth.get_code(self.current_account_id)
         if twofa_code and not twofa_code.startswith("Error"):
             self.root.clipboard_clear()
             self.root.clipboard_append(twofa_code)
@@ -1145,70 +1966,210 @@ class SteamManagerGUI:
 
     def load_avatar(self, steamid):
         """Загрузка аватара из кэша или интернета"""
-        app_dir = get_app_directory()
-        possible_paths = [
-            os.path.join(app_dir, "accounts", "avatars", f"{steamid}.png"),
-            os.path.join(app_dir, "accounts", "avatars", f"{steamid}.jpg"),
-            os.path.join(app_dir, "accounts", "avatars", f"{steamid}.jpeg")
-        ]
-        for cache_path in possible_paths:
-            if os.path.exists(cache_path):
+        cache_path = self.steam_api.find_cached_avatar(steamid)
+        if cache_path:
+            try:
+                photo_image = self.avatar_images.get(cache_path)
+                if photo_image is None:
+                    photo_image = self.cache_avatar_photo(cache_path, self.render_avatar(cache_path))
+                else:
+                    self.avatar_images.move_to_end(cache_path)
+                self.avatar_label.config(image=photo_image)
+                self.avatar_label.image = photo_image
+                # Кэш актуален, пока avatarhash из профиля совпадает с сохраненным
+                player_info = self.steam_api.get_cached_profiles([steamid]).get(str(steamid))
+                if player_info and self.steam_api.is_avatar_stale(steamid, player_info):
+                    Thread(target=self._load_avatar_thread, args=(steamid,), daemon=True).start()
+                return
+            except Exception as e:
+                print(f"Ошибка загрузки аватара из кэша {cache_path}: {e}")
                 try:
-                    image = Image.open(cache_path)
-                    image = image.resize((120, 120), Image.Resampling.LANCZOS)
-                    image = self.make_circular_avatar(image)
-                    photo_image = ImageTk.PhotoImage(image)
-                    self.avatar_label.config(image=photo_image)
-                    self.avatar_label.image = photo_image
-                    return
-                except Exception as e:
-                    print(f"Ошибка загрузки аватара из кэша {cache_path}: {e}")
-                    try:
-                        os.remove(cache_path)
-                    except:
-                        pass
+                    os.remove(cache_path)
+                except:
+                    pass
 
         Thread(target=self._load_avatar_thread, args=(steamid,), daemon=True).start()
 
     def _load_avatar_thread(self, steamid):
         """Поток для загрузки аватара"""
         try:
-            avatar_image = self.steam_api.get_steam_avatar(steamid)
-            if avatar_image:
-                avatar_image = avatar_image.resize((120, 120), Image.Resampling.LANCZOS)
-                avatar_image = self.make_circular_avatar(avatar_image)
-                photo_image = ImageTk.PhotoImage(avatar_image)
-                self.root.after(0, lambda: self.update_avatar(steamid, photo_image))
+            player_info = self.steam_api.get_profile(steamid)
+            cache_path = self.steam_api.ensure_avatar(steamid, player_info)
+            if cache_path:
+                avatar_image = self.render_avatar(cache_path)
+                self.root.after(0, lambda: self.update_avatar(steamid, cache_path, avatar_image))
         except Exception as e:
             print(f"Ошибка загрузки аватара: {e}")
 
-    def update_avatar(self, steamid, photo_image):
+    def update_avatar(self, steamid, cache_path, avatar_image):
         """Обновление аватара в UI"""
+        photo_image = self.avatar_images.get(cache_path)
+        if photo_image is None:
+            photo_image = self.cache_avatar_photo(cache_path, avatar_image)
         if self.current_account and self.current_account.get('steamid') == steamid:
             self.avatar_label.config(image=photo_image)
             self.avatar_label.image = photo_image
 
+    def cache_avatar_photo(self, cache_path, avatar_image):
+        """Создание PhotoImage и сохранение в LRU кэше ограниченного размера"""
+        photo_image = ImageTk.PhotoImage(avatar_image)
+        self.avatar_images[cache_path] = photo_image
+        self.avatar_images.move_to_end(cache_path)
+        limit = max(1, int(self.config_manager.get_setting("avatar_photo_cache_size")))
+        while len(self.avatar_images) > limit:
+            self.avatar_images.popitem(last=False)
+        return photo_image
+
+    def render_avatar(self, cache_path):
+        """Готовый круглый аватар: из кэша отрисовки на диске или отрисовка с сохранением"""
+        rendered_dir = os.path.join(self.steam_api.get_avatars_dir(), "rendered")
+        name = os.path.splitext(os.path.basename(cache_path))[0]
+        size = self.AVATAR_SIZE + 2 * self.AVATAR_BORDER
+        rendered_path = os.path.join(rendered_dir, f"{name}_{size}.png")
+        try:
+            if os.path.getmtime(rendered_path) >= os.path.getmtime(cache_path):
+                image = Image.open(rendered_path)
+                image.load()
+                return image
+        except OSError:
+            pass
+        image = Image.open(cache_path)
+        # Для JPEG декодируем сразу в уменьшенном размере
+        image.draft('RGB', (self.AVATAR_SIZE, self.AVATAR_SIZE))
+        image = image.convert('RGB').resize((self.AVATAR_SIZE, self.AVATAR_SIZE), Image.Resampling.LANCZOS)
+        image = self.make_circular_avatar(image)
+        try:
+            os.makedirs(rendered_dir, exist_ok=True)
+            temp_path = f"{rendered_path}.{threading.get_ident()}.tmp"
+            image.save(temp_path, format='PNG')
+            os.replace(temp_path, rendered_path)
+        except OSError as e:
+            print(f"Ошибка сохранения отрисованного аватара: {e}")
+        return image
+
+    def get_avatar_overlay(self):
+        """Маска круга и обводка аватара (создаются один раз)"""
+        if self._avatar_overlay is None:
+            size = self.AVATAR_SIZE
+            border = self.AVATAR_BORDER
+            mask = Image.new('L', (size, size), 0)
+            ImageDraw.Draw(mask).ellipse([0, 0, size, size], fill=255)
+            frame = Image.new('RGBA', (size + 2 * border, size + 2 * border), (0, 0, 0, 0))
+            ImageDraw.Draw(frame).ellipse([border, border, size + border, size + border],
+                                          outline=self.accent_color, width=border)
+            self._avatar_overlay = (mask, frame)
+        return self._avatar_overlay
+
     def make_circular_avatar(self, image):
         """Создание круглого аватара с обводкой в стиле Steam"""
-        mask = Image.new('L', image.size, 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse([0, 0, image.size[0], image.size[1]], fill=255)
-        circular_image = Image.new('RGBA', image.size, (0, 0, 0, 0))
+        mask, frame = self.get_avatar_overlay()
+        if image.size != mask.size:
+            image = image.resize(mask.size, Image.Resampling.LANCZOS)
+        circular_image = image.convert('RGBA')
         circular_image.putalpha(mask)
-        circular_image.paste(image, (0, 0))
-        result = Image.new('RGBA', (image.size[0] + 6, image.size[1] + 6), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(result)
-        draw.ellipse([3, 3, image.size[0] + 3, image.size[1] + 3], outline=self.accent_color, width=3)
-        result.paste(circular_image, (3, 3), circular_image)
+        result = frame.copy()
+        result.paste(circular_image, (self.AVATAR_BORDER, self.AVATAR_BORDER), circular_image)
         return result
 
     def create_backup(self):
-        """Создание резервной копии всех аккаунтов"""
-        success, message = self.account_manager.backup_accounts()
-        if success:
-            self.show_info_dialog("Успех", message)
-        else:
-            self.show_info_dialog("Ошибка", message)
+        """Создание резервной копии всех аккаунтов в фоновом потоке"""
+        if self._backup_running:
+            self.show_info_dialog("Внимание", "Резервное копирование уже выполняется")
+            return
+        self._backup_running = True
+        self.info_label.config(text="Резервное копирование...")
+        Thread(target=self._backup_thread, daemon=True).start()
+
+    def _backup_thread(self):
+        last_report = [0.0]
+
+        def on_progress(done, total):
+            now = time.monotonic()
+            if done == total or now - last_report[0] >= 0.2:
+                last_report[0] = now
+                self.root.after(0, lambda: self.info_label.config(text=f"Резервное копирование: {done} из {total}"))
+
+        success, message = self.account_manager.backup_accounts(
+            on_progress=on_progress,
+            keep_last=int(self.config_manager.get_setting("backup_keep_last")),
+            keep_daily=int(self.config_manager.get_setting("backup_keep_daily")))
+        self.root.after(0, self.finish_backup, success, message)
+
+    def finish_backup(self, success, message):
+        self._backup_running = False
+        self.info_label.config(text=message)
+        self.show_info_dialog("Успех" if success else "Ошибка", message)
+
+    def restore_backup(self):
+        """Выбор снимка и восстановление отличающихся файлов"""
+        store = self.account_manager.get_backup_store()
+        if not store.list_snapshots():
+            self.show_info_dialog("Внимание", "Резервных копий пока нет")
+            return
+        snapshot_path = filedialog.askopenfilename(
+            title="Выберите резервную копию",
+            initialdir=store.snapshots_dir,
+            filetypes=[("Снимки резервных копий", "*.json")]
+        )
+        if not snapshot_path:
+            return
+        name = os.path.splitext(os.path.basename(snapshot_path))[0]
+        self.info_label.config(text="Сравнение с резервной копией...")
+        Thread(target=self._diff_backup_thread, args=(store, name), daemon=True).start()
+
+    def _diff_backup_thread(self, store, name):
+        try:
+            differences = store.diff_snapshot(name, self.account_manager.accounts_dir)
+            # Объекты проверяются до подтверждения: поврежденные файлы не предлагаются к восстановлению
+            damaged = store.verify_snapshot(name, paths=differences) if differences else {}
+        except Exception as e:
+            message = f"Ошибка чтения резервной копии: {e}"
+            self.root.after(0, lambda: self.show_info_dialog("Ошибка", message))
+            return
+        self.root.after(0, self.confirm_restore, store, name, differences, damaged)
+
+    def confirm_restore(self, store, name, differences, damaged, limit=10):
+        if not differences:
+            self.info_label.config(text=f"Резервная копия {name} совпадает с текущими файлами")
+            self.show_info_dialog("Восстановление", "Все файлы совпадают с резервной копией")
+            return
+        paths = [path for path in differences if path not in damaged]
+        damaged_info = ""
+        if damaged:
+            damaged_names = sorted(damaged)[:limit]
+            damaged_more = f"\n... и еще {len(damaged) - limit}" if len(damaged) > limit else ""
+            damaged_info = (f"\n\nПовреждено в резервной копии и не будет восстановлено: {len(damaged)}\n"
+                            + "\n".join(damaged_names) + damaged_more)
+        if not paths:
+            self.info_label.config(text=f"Резервная копия {name} повреждена")
+            self.show_info_dialog("Восстановление", "Восстанавливать нечего." + damaged_info)
+            return
+        missing = sum(1 for path in paths if differences[path] == 'missing')
+        names = sorted(paths)[:limit]
+        more = f"\n... и еще {len(paths) - limit}" if len(paths) > limit else ""
+        message = (f"Отличается файлов: {len(paths)} (отсутствует: {missing})\n"
+                   + "\n".join(names) + more + damaged_info + "\n\nВосстановить их из резервной копии?")
+        if not self.show_confirm_dialog("Восстановление", message):
+            self.info_label.config(text="Восстановление отменено")
+            return
+        Thread(target=self._restore_backup_thread, args=(store, name, paths), daemon=True).start()
+
+    def _restore_backup_thread(self, store, name, paths):
+        try:
+            restored, errors = store.restore_snapshot(name, self.account_manager.accounts_dir, paths)
+        except Exception as e:
+            restored, errors = [], {name: str(e)}
+        self.root.after(0, self.finish_restore, restored, errors)
+
+    def finish_restore(self, restored, errors, limit=15):
+        lines = [f"Восстановлено файлов: {len(restored)}"]
+        if errors:
+            lines.append(f"Ошибок: {len(errors)}")
+            lines.extend(f"{path}: {error}" for path, error in sorted(errors.items())[:limit])
+        self.info_label.config(text=lines[0])
+        self.show_info_dialog("Восстановление" if not errors else "Восстановление с ошибками", "\n".join(lines))
+        if restored and self.accounts_watcher is None:
+            self.load_accounts()
 
     def open_profile(self):
         """Открытие профиля Steam в браузере"""
@@ -1237,7 +2198,7 @@ class SteamManagerGUI:
     def _check_account_status_thread(self, steamid):
         """Поток для проверки статуса аккаунта"""
         try:
-            player_info = self.steam_api.get_player_info(steamid)
+            player_info = self.steam_api.get_player_info(steamid, force=True)
             if player_info:
                 persona_name = player_info.get('personaname', 'Неизвестно')
                 profile_state = player_info.get('profilestate', 0)
@@ -1258,23 +2219,55 @@ class SteamManagerGUI:
             self.root.after(0, lambda: self.info_label.config(text=f"Ошибка проверки: {e}"))
 
     def import_mafile(self):
-        file_path = filedialog.askopenfilename(
-            title="Выберите maFile",
-            filetypes=[("maFiles", "*.maFile"), ("Все файлы", "*.*")]
+        file_paths = filedialog.askopenfilenames(
+            title="Выберите maFiles или zip-архив",
+            filetypes=[("maFiles и архивы", "*.maFile *.zip"), ("maFiles", "*.maFile"),
+                       ("Zip-архивы", "*.zip"), ("Все файлы", "*.*")]
         )
-        if file_path:
-            success, message = self.account_manager.import_mafile(file_path)
-            if success:
-                self.show_info_dialog("Успех", message)
-                self.load_accounts()
-            else:
-                self.show_info_dialog("Ошибка", message)
+        if file_paths:
+            self.start_bulk_import(list(file_paths))
+
+    def import_directory(self):
+        directory = filedialog.askdirectory(title="Выберите папку с maFiles")
+        if directory:
+            self.start_bulk_import([directory])
+
+    def start_bulk_import(self, paths):
+        """Импорт в фоновом потоке, затем одно обновление таблицы и отчет"""
+        self.info_label.config(text="Импорт аккаунтов...")
+        existing_steamids = {account.steamid for account in self.accounts.values() if account.steamid}
+        Thread(target=self._bulk_import_thread, args=(paths, existing_steamids), daemon=True).start()
+
+    def _bulk_import_thread(self, paths, existing_steamids):
+        report = self.account_manager.bulk_import(
+            paths, existing_steamids,
+            max_workers=self.config_manager.get_setting("import_workers"))
+        self.root.after(0, self.finish_bulk_import, report)
+
+    def finish_bulk_import(self, report, limit=15):
+        """Добавление импортированных строк и итоговый отчет"""
+        imported, duplicates, errors = report['imported'], report['duplicates'], report['errors']
+        if imported:
+            self.apply_account_changes(imported, [], {})
+        lines = [f"Импортировано: {len(imported)}",
+                 f"Пропущено дубликатов: {len(duplicates)}",
+                 f"Ошибок: {len(errors)}"]
+        if errors:
+            lines.append("")
+            lines.extend(f"{name}: {error}" for name, error in sorted(errors.items())[:limit])
+            if len(errors) > limit:
+                lines.append(f"... и еще {len(errors) - limit}")
+        self.info_label.config(text=f"Импортировано аккаунтов: {len(imported)}")
+        self.show_info_dialog("Импорт" if not errors else "Импорт с ошибками", "\n".join(lines))
 
     def copy_2fa(self):
         if not self.current_account:
             self.show_info_dialog("Внимание", "Выберите аккаунт")
             return
-        twofa_code = self.auth.generate_2fa_code(self.current_account.get('shared_secret', ''))
+        twofa_code = self.auth.get_code(self.current_account_id)
+        if not twofa_code:
+            self.show_info_dialog("Внимание", "maFile аккаунта зашифрован, разблокируйте хранилище")
+            return
         self.root.clipboard_clear()
         self.root.clipboard_append(twofa_code)
         self.show_info_dialog("Успех", f"2FA код {twofa_code} скопирован в буфер")
@@ -1283,48 +2276,143 @@ class SteamManagerGUI:
         if not self.current_account:
             self.show_info_dialog("Внимание", "Выберите аккаунт для экспорта")
             return
+        selection = [acc_id for acc_id in self.account_list.selection_ids() if acc_id in self.accounts]
+        if len(selection) > 1:
+            self.export_accounts_archive(selection)
+            return
         file_path = filedialog.asksaveasfilename(
             title="Экспорт maFile",
             defaultextension=".maFile",
             filetypes=[("maFiles", "*.maFile")]
         )
         if file_path:
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.current_account, f, indent=4, ensure_ascii=False)
-                self.show_info_dialog("Успех", "maFile успешно экспортирован")
-            except Exception as e:
-                self.show_info_dialog("Ошибка", f"Ошибка экспорта: {e}")
+            success, message = self.account_manager.export_mafile(self.current_account, file_path)
+            self.show_info_dialog("Успех" if success else "Ошибка", message)
+
+    def export_accounts_archive(self, acc_ids):
+        """Экспорт выбранных аккаунтов в один архив в фоновом потоке"""
+        file_path = filedialog.asksaveasfilename(
+            title=f"Экспорт {len(acc_ids)} аккаунтов",
+            defaultextension=".zip",
+            filetypes=[("Zip-архив", "*.zip"), ("Tar-архив", "*.tar"),
+                       ("Tar.gz-архив", "*.tar.gz"), ("Tar.xz-архив", "*.tar.xz")]
+        )
+        if not file_path:
+            return
+        include_avatars = self.show_confirm_dialog("Экспорт", "Добавить в архив сохраненные аватары?")
+        accounts = {acc_id: self.accounts[acc_id] for acc_id in acc_ids}
+        self.info_label.config(text=f"Экспорт аккаунтов: 0 из {len(accounts)}")
+        Thread(target=self._export_accounts_thread, args=(accounts, file_path, include_avatars),
+               daemon=True).start()
+
+    def _export_accounts_thread(self, accounts, file_path, include_avatars):
+        last_report = [0.0]
+
+        def on_progress(done, total):
+            now = time.monotonic()
+            if done == total or now - last_report[0] >= 0.2:
+                last_report[0] = now
+                self.root.after(0, lambda: self.info_label.config(text=f"Экспорт аккаунтов: {done} из {total}"))
+
+        try:
+            count, errors = self.account_manager.export_accounts(
+                accounts, file_path, include_avatars=include_avatars, on_progress=on_progress)
+        except Exception as e:
+            message = f"Ошибка экспорта: {e}"
+            self.root.after(0, lambda: self.show_info_dialog("Ошибка", message))
+            return
+        self.root.after(0, self.finish_accounts_export, file_path, count, errors)
+
+    def finish_accounts_export(self, file_path, count, errors, limit=15):
+        """Отчет об экспорте в архив"""
+        self.info_label.config(text=f"Экспортировано аккаунтов: {count}")
+        if not errors:
+            self.show_info_dialog("Успех", f"Экспортировано аккаунтов: {count}\n{file_path}")
+            return
+        lines = [f"Экспортировано аккаунтов: {count}", f"Ошибок: {len(errors)}", ""]
+        lines.extend(f"{acc_id}: {error}" for acc_id, error in sorted(errors.items())[:limit])
+        if len(errors) > limit:
+            lines.append(f"... и еще {len(errors) - limit}")
+        self.show_info_dialog("Экспорт с ошибками", "\n".join(lines))
 
     def auto_refresh(self):
-        """Автоматическое обновление 2FA кодов в реальном времени"""
-        for item in self.tree.get_children():
-            acc_id = self.tree.item(item, 'tags')[0]
-            if acc_id in self.accounts:
-                account = self.accounts[acc_id]
-                twofa = self.auth.generate_2fa_code(account.get('shared_secret', ''))
-                current_values = self.tree.item(item, 'values')
-                new_values = (
-                    current_values[0],
-                    current_values[1],
-                    twofa,
-                    current_values[3]
-                )
-                self.tree.item(item, values=new_values)
+        """Автоматическое обновление 2FA кодов точно на границе 30-секундного шага Steam"""
+        if self.is_minimized():
+            # Свернутое окно не перерисовываем, обновим при восстановлении
+            self._refresh_pending = True
+        else:
+            self.refresh_codes()
+        self.schedule_code_refresh()
+
+    def schedule_code_refresh(self):
+        """Планирование обновления на следующую границу шага и предрасчета кодов перед ней"""
+        now = time.time()
+        step = SteamAuth.get_timestep(now)
+        delay_ms = int(((step + 1) * SteamAuth.TIME_STEP - now) * 1000) + self.REFRESH_MARGIN_MS
+        self.root.after(delay_ms, self.auto_refresh)
+        precompute_ms = delay_ms - self.PRECOMPUTE_LEAD_MS
+        if precompute_ms > 0:
+            self.root.after(precompute_ms, lambda: self.precompute_next_codes(step + 1))
+
+    def precompute_next_codes(self, timestep):
+        """Расчет таблицы кодов следующего шага в фоне, чтобы смена была мгновенной"""
+        if self.is_minimized():
+            return
+        # В виртуализированном режиме коды нужны только для видимых строк
+        acc_ids = None if self.account_list.FULL_TABLE else self.account_list.visible_ids()
+        Thread(target=self.auth.get_codes, args=(timestep, acc_ids), daemon=True).start()
+
+    def is_minimized(self):
+        """Свернуто ли главное окно"""
+        try:
+            return self.root.state() == 'iconic'
+        except tk.TclError:
+            return False
+
+    def on_window_map(self, event):
+        """Восстановление окна: догоняем пропущенное обновление кодов"""
+        if event.widget is self.root:
+            self.startup_timer.mark("Окно показано")
+        if event.widget is self.root and self._refresh_pending:
+            self.refresh_codes()
+
+    def tick_countdown(self):
+        """Обратный отсчет срока действия текущего кода (без пересчета кодов)"""
+        now = time.time()
+        if not self.is_minimized():
+            remaining = SteamAuth.TIME_STEP - int(now) % SteamAuth.TIME_STEP
+            color = "#ff6b6b" if remaining <= 5 else self.text_color
+            self.countdown_label.config(text=f"⏱ {remaining} с", fg=color)
+        self.root.after(1000 - int((now % 1) * 1000) + 5, self.tick_countdown)
+
+    def refresh_codes(self):
+        """Обновление 2FA кодов в таблице и в панели информации"""
+        self._refresh_pending = False
+        if self.account_list.FULL_TABLE:
+            self.auth.get_codes()
+        self.account_list.refresh()
 
         if self.current_account_id and self.current_account_id in self.accounts:
-            self.current_account = self.accounts[self.current_account_id]
-            self.update_account_info()
+            self.update_code_display()
 
-        self.root.after(30000, self.auto_refresh)
+    def update_code_display(self):
+        """Обновление 2FA кода выбранного аккаунта в панели информации"""
+        twofa_code = self.auth.get_code(self.current_account_id)
+        self.twofa_label.config(text=f"2FA Code: {twofa_code or '🔒'}")
+        if twofa_code and not twofa_code.startswith("Error"):
+            self.copy_twofa_btn.pack(side=tk.RIGHT)
+        else:
+            self.copy_twofa_btn.pack_forget()
 
 def main():
     print("Запуск Steam Account Manager...")
     # Устанавливаем иконку для панели задач Windows
     if os.name == 'nt':
         set_windows_taskbar_icon()
-    root = tk.Tk()
-    app = SteamManagerGUI(root)
+    startup_timer = StartupTimer()
+    with startup_timer.measure("Создание окна Tk"):
+        root = tk.Tk()
+    app = SteamManagerGUI(root, startup_timer=startup_timer)
     print("Приложение запущено")
     root.mainloop()
 
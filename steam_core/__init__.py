@@ -0,0 +1,36 @@
+"""Ядро Steam Account Manager без зависимости от GUI
+
+Классы импортируются при первом обращении: `from steam_core import SteamAuth`
+не загружает requests, PIL и tkinter.
+"""
+import importlib
+
+_EXPORTS = {
+    'get_app_directory': 'paths',
+    'ConfigManager': 'config',
+    'SteamAuth': 'auth',
+    'SteamAPI': 'api',
+    'AvatarStore': 'api',
+    'AvatarPrefetcher': 'api',
+    'JitteredRetry': 'api',
+    'AccountManager': 'accounts',
+    'AccountRecord': 'accounts',
+    'AccountWriter': 'accounts',
+    'AccountDecryptor': 'accounts',
+    'MaFileVault': 'vault',
+    'BackupStore': 'backup',
+    'AccountsWatcher': 'watcher',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
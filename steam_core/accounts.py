@@ -0,0 +1,692 @@
+import io
+import json
+import os
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Thread
+
+from .auth import SteamAuth
+from .backup import BackupStore
+from .paths import get_app_directory
+from .vault import MaFileVault
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class AccountRecord:
+    """Аккаунт в списке: только поля таблицы и генерации кодов, полный maFile читается по запросу"""
+    __slots__ = ('path', 'account_name', 'steamid', 'shared_secret', 'has_identity_secret', 'encrypted', 'vault')
+
+    def __init__(self, path, account_name=None, steamid=None, shared_secret=None, has_identity_secret=False,
+                 encrypted=False, vault=None):
+        self.path = path
+        self.account_name = account_name
+        self.steamid = steamid
+        self.shared_secret = shared_secret
+        self.has_identity_secret = has_identity_secret
+        self.encrypted = encrypted
+        self.vault = vault
+
+    @classmethod
+    def from_fields(cls, path, fields, vault=None):
+        """Запись из полей манифеста; у зашифрованных файлов секреты появляются после расшифровки"""
+        encrypted = bool(fields.get('encrypted'))
+        return cls(path, fields.get('account_name'), fields.get('steamid'),
+                   fields.get('shared_secret'), bool(fields.get('has_identity_secret')),
+                   encrypted, vault if encrypted else None)
+
+    @property
+    def locked(self):
+        """Зашифрованный аккаунт, секреты которого еще не расшифрованы"""
+        return self.encrypted and not self.shared_secret
+
+    def get(self, key, default=None):
+        """Доступ к полю как у словаря maFile"""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def load_document(self):
+        """Полные данные maFile (Session, identity_secret, revocation_code и т.д.)"""
+        if self.vault is not None:
+            return self.vault.read_document(self.path)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _key(self):
+        return (self.path, self.account_name, self.steamid, self.shared_secret, self.has_identity_secret,
+                self.encrypted)
+
+    def __eq__(self, other):
+        if not isinstance(other, AccountRecord):
+            return NotImplemented
+        return self._key() == other._key()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"AccountRecord({self.account_name!r}, steamid={self.steamid!r})"
+
+class AccountWriter:
+    """Отложенная запись maFiles: изменения копятся в очереди и пишутся пачкой в фоновом потоке"""
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._thread = None
+
+    @staticmethod
+    def write_atomic(path, document):
+        """Запись через временный файл и os.replace: при сбое maFile остается прежним"""
+        data = json.dumps(document, indent=4, ensure_ascii=False)
+        fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def enqueue(self, path, document, expected_stat=None):
+        """Постановка записи в очередь; повторная запись того же файла заменяет прежнюю
+
+        expected_stat: (mtime_ns, size) файла при чтении; если файл с тех пор изменился,
+        запись пропускается, чтобы не затереть чужие правки
+        """
+        with self._condition:
+            self._pending[path] = (document, expected_stat)
+            if self._thread is None:
+                self._thread = Thread(target=self._worker, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """Синхронная запись всей очереди"""
+        with self._condition:
+            pending, self._pending = self._pending, {}
+        errors = {}
+        for path, (document, expected_stat) in pending.items():
+            try:
+                if expected_stat is not None:
+                    stat = os.stat(path)
+                    if (stat.st_mtime_ns, stat.st_size) != tuple(expected_stat):
+                        continue
+                self.write_atomic(path, document)
+            except Exception as e:
+                errors[path] = str(e)
+        for path, error in errors.items():
+            print(f"Ошибка записи {path}: {error}")
+        return errors
+
+    def _worker(self):
+        """Фоновый поток: ждет паузу после последнего изменения и пишет очередь целиком"""
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            time.sleep(self.delay)
+            self.flush()
+
+class AccountManager:
+    MANIFEST_FILE = ".manifest_cache.json"
+    # Версия 2: кэш пишется с правами 0600, кэши прежней версии перезаписываются при первой загрузке
+    MANIFEST_VERSION = 2
+    LIST_FIELDS = ('account_name', 'steamid', 'shared_secret')
+    PARSE_BATCH_SIZE = 64
+
+    def __init__(self, accounts_dir="accounts"):
+        app_dir = get_app_directory()
+        self.accounts_dir = os.path.join(app_dir, accounts_dir)
+        self.manifest_path = os.path.join(self.accounts_dir, self.MANIFEST_FILE)
+        self._manifest_lock = threading.Lock()
+        self.writer = AccountWriter()
+        self.vault = MaFileVault(self.accounts_dir)
+        # Поля расшифрованных файлов {путь: (mtime_ns, поля)}, только в памяти
+        self._decrypted = {}
+        os.makedirs(self.accounts_dir, exist_ok=True)
+        avatars_dir = os.path.join(self.accounts_dir, "avatars")
+        os.makedirs(avatars_dir, exist_ok=True)
+        self.auth = SteamAuth()
+
+    def set_steam_api(self, steam_api):
+        """Установить Steam API instance"""
+        self.steam_api = steam_api
+
+    def extract_steamid_from_mafile(self, account_data):
+        """Автоматическое извлечение SteamID из данных maFile"""
+        try:
+            steamid = None
+            if 'Session' in account_data and 'SteamID' in account_data['Session']:
+                steamid = str(account_data['Session']['SteamID'])
+            elif 'steamid' in account_data:
+                steamid = str(account_data['steamid'])
+            elif 'Session' in account_data and 'SteamLogin' in account_data['Session']:
+                steam_login = account_data['Session']['SteamLogin']
+                if '%7C%7C' in steam_login:
+                    steamid = steam_login.split('%7C%7C')[0]
+            elif 'account_name' in account_data and account_data['account_name'].isdigit():
+                steamid = account_data['account_name']
+            return steamid
+        except Exception as e:
+            print(f"Ошибка извлечения SteamID: {e}")
+            return None
+
+    def load_all_accounts(self, max_workers=None, chunk_size=500, on_chunk=None):
+        """Загрузка списка аккаунтов: разбираются только новые и измененные maFiles
+
+        При max_workers > 1 файлы разбираются пулом потоков, иначе в текущем потоке.
+        on_chunk({acc_id: поля}) вызывается из потока загрузки по мере готовности
+        каждых chunk_size аккаунтов.
+        Возвращает (accounts, errors), errors: {имя файла: текст ошибки}.
+        """
+        accounts = {}
+        errors = {}
+        if not os.path.exists(self.accounts_dir):
+            errors[self.accounts_dir] = "Директория не существует"
+            return accounts, errors
+        manifest = self.load_manifest()
+        self.vault.load_manifest()
+        new_manifest = {}
+        chunk = {}
+
+        def add_account(filename, entry):
+            new_manifest[filename] = entry
+            account_id = filename[:-len('.maFile')]
+            accounts[account_id] = chunk[account_id] = self._make_record(
+                os.path.join(self.accounts_dir, filename), entry)
+            if on_chunk and len(chunk) >= chunk_size:
+                on_chunk(dict(chunk))
+                chunk.clear()
+
+        changed = []
+        with os.scandir(self.accounts_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.maFile'):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    cached = manifest.get(entry.name)
+                    if cached and cached.get('mtime') == stat.st_mtime_ns and cached.get('size') == stat.st_size:
+                        add_account(entry.name, cached)
+                    else:
+                        changed.append(entry)
+                except Exception as e:
+                    errors[entry.name] = str(e)
+        if changed:
+            for batch in self._parse_changed(changed, max_workers):
+                for filename, entry, error in batch:
+                    if error is None:
+                        add_account(filename, entry)
+                    else:
+                        errors[filename] = error
+        if on_chunk and chunk:
+            on_chunk(dict(chunk))
+        if changed or new_manifest.keys() != manifest.keys():
+            self.save_manifest(new_manifest)
+        print(f"Всего загружено аккаунтов: {len(accounts)} (разобрано maFiles: {len(changed)})")
+        return accounts, errors
+
+    def _parse_changed(self, changed, max_workers):
+        """Результаты разбора пачками по мере готовности"""
+        max_workers = max(1, min(int(max_workers or 1), len(changed)))
+        if max_workers == 1:
+            # Разбор JSON упирается в GIL: на локальном диске один поток быстрее пула
+            for i in range(0, len(changed), self.PARSE_BATCH_SIZE):
+                yield self._parse_account_batch(changed[i:i + self.PARSE_BATCH_SIZE])
+            return
+        # Файлы отдаются пулу пачками: на 20k мелких задач накладные расходы пула заметны
+        batch_size = max(1, min(self.PARSE_BATCH_SIZE, len(changed) // (max_workers * 4)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._parse_account_batch, changed[i:i + batch_size])
+                       for i in range(0, len(changed), batch_size)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def load_account_files(self, filenames):
+        """Разбор отдельных maFiles (для изменений от наблюдателя): (accounts, errors)"""
+        accounts = {}
+        errors = {}
+        self.vault.load_manifest()
+        for filename in filenames:
+            file_path = os.path.join(self.accounts_dir, filename)
+            try:
+                entry = self._parse_account_file(file_path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                errors[filename] = str(e)
+                continue
+            accounts[filename[:-len('.maFile')]] = self._make_record(file_path, entry)
+        return accounts, errors
+
+    def close(self):
+        """Запись отложенных изменений перед выходом"""
+        self.writer.flush()
+
+    def load_manifest_accounts(self):
+        """Список аккаунтов из манифеста без чтения maFiles (для мгновенного показа при запуске)"""
+        return {filename[:-len('.maFile')]: self._make_record(os.path.join(self.accounts_dir, filename), entry)
+                for filename, entry in self.load_manifest().items()}
+
+    def _make_record(self, path, entry):
+        """Запись аккаунта из манифеста; для зашифрованных подставляются уже расшифрованные поля"""
+        fields = entry['fields']
+        if fields.get('encrypted'):
+            cached = self._decrypted.get(path)
+            if cached and cached[0] == entry['mtime']:
+                fields = dict(cached[1], encrypted=True)
+        return AccountRecord.from_fields(path, fields, self.vault)
+
+    def decrypt_account(self, record):
+        """Расшифровка maFile аккаунта: поля списка с секретами"""
+        stat = os.stat(record.path)
+        document = self.vault.read_document(record.path)
+        fields = self.get_list_fields(document)
+        self._decrypted[record.path] = (stat.st_mtime_ns, fields)
+        return fields
+
+    def unlock_vault(self, password):
+        """Разблокировка зашифрованного хранилища паролем"""
+        return self.vault.unlock(password)
+
+    def lock_vault(self):
+        self.vault.lock()
+        self._decrypted.clear()
+
+    def encrypt_vault(self, password, on_progress=None):
+        """Шифрование всех незашифрованных maFiles паролем: (число зашифрованных, ошибки {файл: текст})"""
+        self.writer.flush()
+        self.vault.load_manifest()
+        paths = [os.path.join(self.accounts_dir, filename) for filename in sorted(os.listdir(self.accounts_dir))
+                 if filename.endswith('.maFile') and not self.vault.is_encrypted_file(filename)]
+        errors = self.vault.encrypt_files(password, paths, on_progress=on_progress)
+        return len(paths) - len(errors), errors
+
+    def write_account(self, path, document):
+        """Атомарная запись maFile (зашифрованного, если хранилище зашифровано)"""
+        if self.vault.is_encrypted():
+            self.vault.write_document(path, document)
+        else:
+            self.writer.write_atomic(path, document)
+
+    def write_accounts(self, documents):
+        """Запись пачки maFiles [(путь, документ)]: манифест хранилища сохраняется один раз
+
+        Возвращает ошибки {путь: текст ошибки}.
+        """
+        if self.vault.is_encrypted():
+            return self.vault.write_documents(documents)
+        errors = {}
+        for path, document in documents:
+            try:
+                self.writer.write_atomic(path, document)
+            except Exception as e:
+                errors[path] = str(e)
+        return errors
+
+    def _parse_account_batch(self, entries):
+        """Разбор пачки maFiles: [(имя файла, запись манифеста, ошибка)]"""
+        results = []
+        for entry in entries:
+            try:
+                results.append((entry.name, self._parse_account_file(entry.path), None))
+            except Exception as e:
+                results.append((entry.name, None, str(e)))
+        return results
+
+    def _parse_account_file(self, file_path):
+        """Разбор maFile и запись манифеста для него (файл только читается)"""
+        if self.vault.is_encrypted_file(os.path.basename(file_path)):
+            # Зашифрованный файл не расшифровываем: поля списка берем из manifest.json
+            stat = os.stat(file_path)
+            return {'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                    'fields': self.vault.get_list_fields(os.path.basename(file_path))}
+        with open(file_path, 'r', encoding='utf-8') as f:
+            stat = os.fstat(f.fileno())
+            account_data = json.load(f)
+        if 'steamid' not in account_data or not account_data.get('steamid'):
+            steamid = self.extract_steamid_from_mafile(account_data)
+            if steamid:
+                account_data['steamid'] = steamid
+                # Дописываем SteamID в файл позже и пачкой, а не во время загрузки
+                self.writer.enqueue(file_path, account_data, (stat.st_mtime_ns, stat.st_size))
+        return {'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                'fields': self.get_list_fields(account_data)}
+
+    @staticmethod
+    def get_list_fields(account_data):
+        """Поля maFile, нужные таблице, статусу и генерации кодов"""
+        fields = {field: account_data[field] for field in AccountManager.LIST_FIELDS
+                  if account_data.get(field)}
+        fields['has_identity_secret'] = bool(account_data.get('identity_secret'))
+        return fields
+
+    def load_manifest(self):
+        """Чтение манифеста {имя файла: {mtime, size, fields}}"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.MANIFEST_VERSION:
+                return manifest.get('files', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ошибка чтения манифеста аккаунтов: {e}")
+        return {}
+
+    def save_manifest(self, files):
+        """Атомарная запись манифеста
+
+        Кэш хранит shared_secret незашифрованных аккаунтов (коды доступны без чтения maFiles),
+        поэтому файл создается с правами 0600, а у зашифрованных аккаунтов секреты не пишутся.
+        """
+        for entry in files.values():
+            fields = entry.get('fields') or {}
+            if fields.get('encrypted') and 'shared_secret' in fields:
+                entry['fields'] = {key: value for key, value in fields.items() if key != 'shared_secret'}
+        with self._manifest_lock:
+            temp_path = None
+            try:
+                # json.dumps целиком быстрее потоковой json.dump на десятках тысяч записей
+                data = json.dumps({'version': self.MANIFEST_VERSION, 'files': files}, ensure_ascii=False)
+                # mkstemp создает файл с правами 0600
+                fd, temp_path = tempfile.mkstemp(prefix=".manifest_cache.", suffix=".tmp", dir=self.accounts_dir)
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(temp_path, self.manifest_path)
+            except Exception as e:
+                print(f"Ошибка сохранения манифеста аккаунтов: {e}")
+                if temp_path is not None:
+                    try:
+                        os.remove(temp_path)
+                    except OSError:
+                        pass
+
+    def import_mafile(self, file_path):
+        """Импорт maFile с автоматическим извлечением SteamID"""
+        report = self.bulk_import([file_path])
+        if report['errors']:
+            return False, f"Ошибка импорта: {next(iter(report['errors'].values()))}"
+        for account in report['imported'].values():
+            steamid_info = f" (SteamID: {account.steamid})" if account.steamid else ""
+            return True, f"Аккаунт {account.account_name}{steamid_info} импортирован!"
+        return False, "Ошибка импорта: maFile не найден"
+
+    @staticmethod
+    def collect_import_sources(paths, archives):
+        """Список (имя, функция чтения байтов) для maFiles из файлов, каталогов и zip-архивов
+
+        Открытые архивы добавляются в archives, закрыть их должен вызывающий
+        """
+        sources = []
+        for path in paths:
+            if os.path.isdir(path):
+                for dirpath, _, filenames in os.walk(path):
+                    for filename in sorted(filenames):
+                        if filename.lower().endswith('.mafile'):
+                            file_path = os.path.join(dirpath, filename)
+                            sources.append((file_path, lambda file_path=file_path: _read_bytes(file_path)))
+            elif zipfile.is_zipfile(path):
+                archive = zipfile.ZipFile(path)
+                archives.append(archive)
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith('.mafile'):
+                        sources.append((f"{os.path.basename(path)}:{info.filename}",
+                                        lambda info=info, archive=archive: archive.read(info)))
+            else:
+                sources.append((path, lambda path=path: _read_bytes(path)))
+        return sources
+
+    def _validate_import(self, read_source):
+        """Разбор и проверка одного импортируемого maFile: (account_data, ошибка)"""
+        try:
+            account_data = json.loads(read_source())
+        except Exception as e:
+            return None, f"не удалось прочитать JSON: {e}"
+        if not isinstance(account_data, dict):
+            return None, "неверный формат maFile"
+        account_name = account_data.get('account_name')
+        shared_secret = account_data.get('shared_secret')
+        if not account_name or not isinstance(account_name, str):
+            return None, "нет account_name"
+        if os.path.basename(account_name) != account_name or account_name.startswith('.'):
+            return None, f"недопустимое имя аккаунта: {account_name}"
+        if not shared_secret:
+            return None, "нет shared_secret"
+        try:
+            if len(SteamAuth.decode_secret(shared_secret)) != 20:
+                return None, "shared_secret неверной длины"
+        except Exception as e:
+            return None, f"shared_secret не декодируется: {e}"
+        test_code = SteamAuth().generate_2fa_code(shared_secret)
+        if test_code.startswith("Error"):
+            return None, f"не удалось сгенерировать код: {test_code}"
+        steamid = self.extract_steamid_from_mafile(account_data)
+        if steamid:
+            account_data['steamid'] = steamid
+        return account_data, None
+
+    def bulk_import(self, paths, existing_steamids=(), max_workers=8):
+        """Параллельный импорт maFiles из файлов, каталогов и zip-архивов
+
+        Файлы проверяются в пуле потоков (JSON, shared_secret, пробный код), дубликаты
+        по SteamID отбрасываются, прошедшие проверку записываются одной пачкой.
+        Возвращает {'imported': {acc_id: AccountRecord}, 'duplicates': [имена], 'errors': {имя: ошибка}}
+        """
+        report = {'imported': {}, 'duplicates': [], 'errors': {}}
+        archives = []
+        try:
+            sources = self.collect_import_sources(paths, archives)
+            if not sources:
+                return report
+            max_workers = max(1, min(int(max_workers or 1), len(sources)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(lambda source: self._validate_import(source[1]), sources))
+        except Exception as e:
+            report['errors'][", ".join(paths)] = str(e)
+            return report
+        finally:
+            for archive in archives:
+                archive.close()
+
+        seen_steamids = {str(steamid) for steamid in existing_steamids if steamid}
+        to_write = {}
+        for (name, _), (account_data, error) in zip(sources, results):
+            if error:
+                report['errors'][name] = error
+                continue
+            steamid = account_data.get('steamid')
+            if steamid and str(steamid) in seen_steamids:
+                report['duplicates'].append(name)
+                continue
+            account_id = account_data['account_name']
+            file_path = os.path.join(self.accounts_dir, f"{account_id}.maFile")
+            if account_id in to_write:
+                report['duplicates'].append(name)
+                continue
+            if os.path.exists(file_path):
+                report['errors'][name] = f"файл {account_id}.maFile уже существует"
+                continue
+            if steamid:
+                seen_steamids.add(str(steamid))
+            to_write[account_id] = (file_path, account_data)
+
+        try:
+            write_errors = self.write_accounts(list(to_write.values()))
+        except Exception as e:
+            write_errors = {file_path: str(e) for file_path, _ in to_write.values()}
+        for account_id, (file_path, account_data) in to_write.items():
+            if file_path in write_errors:
+                report['errors'][account_id] = f"ошибка записи: {write_errors[file_path]}"
+                continue
+            fields = self.get_list_fields(account_data)
+            if self.vault.is_encrypted_file(f"{account_id}.maFile"):
+                fields['encrypted'] = True
+                self._decrypted[file_path] = (os.stat(file_path).st_mtime_ns, fields)
+            report['imported'][account_id] = AccountRecord.from_fields(file_path, fields, self.vault)
+        return report
+
+    def export_mafile(self, record, file_path):
+        """Экспорт maFile аккаунта в открытом виде (зашифрованный расшифровывается)"""
+        try:
+            self.writer.write_atomic(file_path, record.load_document())
+            return True, "maFile успешно экспортирован"
+        except Exception as e:
+            return False, f"Ошибка экспорта: {e}"
+
+    @staticmethod
+    def get_archive_format(archive_path):
+        """Формат архива по расширению: zip, tar, tar.gz или tar.xz"""
+        name = archive_path.lower()
+        if name.endswith(('.tar.gz', '.tgz')):
+            return 'tar.gz'
+        if name.endswith(('.tar.xz', '.txz')):
+            return 'tar.xz'
+        if name.endswith('.tar'):
+            return 'tar'
+        return 'zip'
+
+    def export_accounts(self, accounts, archive_path, include_avatars=False, on_progress=None):
+        """Потоковый экспорт аккаунтов в один zip/tar архив
+
+        accounts: {acc_id: AccountRecord}. Файлы копируются в архив с диска по одному,
+        архив пишется во временный файл и заменяет целевой только после успешного завершения.
+        on_progress(done, total) вызывается из потока экспорта. Возвращает (count, errors).
+        """
+        archive_format = self.get_archive_format(archive_path)
+        errors = {}
+        count = 0
+        total = len(accounts)
+        fd, temp_path = tempfile.mkstemp(prefix=".export_", suffix=".tmp",
+                                         dir=os.path.dirname(os.path.abspath(archive_path)))
+        os.close(fd)
+        try:
+            if archive_format == 'zip':
+                archive = zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+                add_file = archive.write
+            else:
+                mode = {'tar': 'w', 'tar.gz': 'w:gz', 'tar.xz': 'w:xz'}[archive_format]
+                archive = tarfile.open(temp_path, mode)
+                add_file = archive.add
+            with archive:
+                if self.vault.is_encrypted():
+                    # Зашифрованные файлы без соли и IV из манифеста не прочитать
+                    exported = {f"{acc_id}.maFile" for acc_id in accounts}
+                    manifest = dict(self.vault.load_manifest())
+                    manifest['entries'] = [entry for entry in manifest.get('entries') or []
+                                           if entry.get('filename') in exported]
+                    data = json.dumps(manifest, indent=2).encode('utf-8')
+                    if archive_format == 'zip':
+                        archive.writestr("maFiles/manifest.json", data)
+                    else:
+                        info = tarfile.TarInfo("maFiles/manifest.json")
+                        info.size = len(data)
+                        info.mtime = int(time.time())
+                        archive.addfile(info, io.BytesIO(data))
+                for done, (acc_id, account) in enumerate(accounts.items(), 1):
+                    try:
+                        add_file(account.path, f"maFiles/{acc_id}.maFile")
+                        count += 1
+                        if include_avatars and account.steamid and getattr(self, 'steam_api', None):
+                            avatar_path = self.steam_api.find_cached_avatar(account.steamid)
+                            if avatar_path:
+                                extension = os.path.splitext(avatar_path)[1]
+                                add_file(avatar_path, f"avatars/{account.steamid}{extension}")
+                    except Exception as e:
+                        errors[acc_id] = str(e)
+                    if on_progress:
+                        on_progress(done, total)
+            os.replace(temp_path, archive_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return count, errors
+
+    def get_backup_store(self):
+        return BackupStore(os.path.join(get_app_directory(), "backups"))
+
+    def get_backup_files(self):
+        """Файлы для резервной копии {относительный путь: путь}: maFiles и аватары без производных кэшей"""
+        files = {}
+        for filename in os.listdir(self.accounts_dir):
+            if filename.endswith('.maFile') or filename == MaFileVault.MANIFEST_FILE:
+                files[filename] = os.path.join(self.accounts_dir, filename)
+        avatars_dir = os.path.join(self.accounts_dir, "avatars")
+        for dirpath, dirnames, filenames in os.walk(avatars_dir):
+            # Отрисованные круглые аватары пересоздаются из исходных
+            dirnames[:] = [dirname for dirname in dirnames if dirname != "rendered"]
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, self.accounts_dir).replace(os.sep, '/')] = path
+        return files
+
+    def backup_accounts(self, on_progress=None, keep_last=10, keep_daily=30):
+        """Инкрементальная резервная копия аккаунтов и аватаров"""
+        try:
+            store = self.get_backup_store()
+            name, stored = store.create_snapshot(self.get_backup_files(), on_progress=on_progress)
+            removed_snapshots, _ = store.prune(keep_last=keep_last, keep_daily=keep_daily)
+            pruned = f", удалено старых: {removed_snapshots}" if removed_snapshots else ""
+            if name is None:
+                return True, f"Изменений с последней резервной копии нет{pruned}"
+            return True, f"Резервная копия создана: {name} (новых файлов: {stored}){pruned}"
+        except Exception as e:
+            return False, f"Ошибка создания резервной копии: {e}"
+
+class AccountDecryptor:
+    """Фоновая расшифровка maFiles по запросу, по одному файлу в порядке запросов"""
+    def __init__(self, account_manager, on_decrypted):
+        self.account_manager = account_manager
+        self.on_decrypted = on_decrypted
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._requested = set()
+        self._thread = None
+
+    def request(self, acc_id, record):
+        """Постановка аккаунта в очередь; повторные запросы игнорируются"""
+        with self._condition:
+            if acc_id in self._requested:
+                return
+            self._requested.add(acc_id)
+            self._queue.append((acc_id, record))
+            if self._thread is None:
+                self._thread = Thread(target=self._worker, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self):
+        """Очистка очереди и списка уже запрошенных (например, после смены пароля)"""
+        with self._condition:
+            self._queue.clear()
+            self._requested.clear()
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                acc_id, record = self._queue.popleft()
+            try:
+                fields, error = self.account_manager.decrypt_account(record), None
+            except Exception as e:
+                fields, error = None, str(e)
+            self.on_decrypted(acc_id, record, fields, error)
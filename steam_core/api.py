@@ -0,0 +1,525 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Thread
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .paths import get_app_directory
+
+class JitteredRetry(Retry):
+    """Политика повторов с экспоненциальной задержкой и случайным разбросом"""
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        # Разброс не дает параллельным потокам повторять запросы одновременно
+        return random.uniform(backoff / 2, backoff)
+
+class AvatarStore:
+    """Контентно-адресуемое хранилище аватаров: файлы по avatarhash и индекс SteamID -> hash"""
+    BLOBS_DIR = "blobs"
+    INDEX_FILE = "avatar_index.json"
+    EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+    def __init__(self, avatars_dir):
+        self.avatars_dir = avatars_dir
+        self.blobs_dir = os.path.join(avatars_dir, self.BLOBS_DIR)
+        self.index_path = os.path.join(avatars_dir, self.INDEX_FILE)
+        self._index = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _get_index(self):
+        """Индекс SteamID -> avatarhash (загружается при первом обращении)"""
+        with self._lock:
+            if self._index is None:
+                self._index = {}
+                if os.path.exists(self.index_path):
+                    try:
+                        with open(self.index_path, 'r', encoding='utf-8') as f:
+                            self._index = json.load(f)
+                    except Exception as e:
+                        print(f"Ошибка загрузки индекса аватаров: {e}")
+                self._migrate_legacy_files()
+            return self._index
+
+    def _migrate_legacy_files(self):
+        """Перенос старых файлов {steamid}.jpg с известным hash в общее хранилище"""
+        for steamid, avatar_hash in list(self._index.items()):
+            for extension in self.EXTENSIONS:
+                legacy_path = os.path.join(self.avatars_dir, f"{steamid}{extension}")
+                if not os.path.exists(legacy_path):
+                    continue
+                try:
+                    if self.find_blob(avatar_hash):
+                        os.remove(legacy_path)
+                    else:
+                        os.makedirs(self.blobs_dir, exist_ok=True)
+                        os.replace(legacy_path, os.path.join(self.blobs_dir, f"{avatar_hash}{extension}"))
+                except OSError as e:
+                    print(f"Ошибка переноса аватара {legacy_path}: {e}")
+
+    def get_hash(self, steamid):
+        """avatarhash аватара, сохраненного для аккаунта"""
+        return self._get_index().get(str(steamid))
+
+    def set_hash(self, steamid, avatar_hash, flush=True):
+        """Привязать аккаунт к изображению в хранилище"""
+        index = self._get_index()
+        with self._lock:
+            if index.get(str(steamid)) != avatar_hash:
+                index[str(steamid)] = avatar_hash
+                self._dirty = True
+            # Старый файл {steamid}.jpg больше не нужен
+            for extension in self.EXTENSIONS:
+                legacy_path = os.path.join(self.avatars_dir, f"{steamid}{extension}")
+                if os.path.exists(legacy_path):
+                    try:
+                        os.remove(legacy_path)
+                    except OSError:
+                        pass
+        if flush:
+            self.flush()
+
+    def find_blob(self, avatar_hash):
+        """Путь к изображению с указанным hash, если оно уже есть локально"""
+        if not avatar_hash:
+            return None
+        for extension in self.EXTENSIONS:
+            blob_path = os.path.join(self.blobs_dir, f"{avatar_hash}{extension}")
+            if os.path.exists(blob_path):
+                return blob_path
+        return None
+
+    def adopt_legacy_file(self, steamid, avatar_hash):
+        """Перенос старого файла {steamid}.jpg без записи в индексе в хранилище под avatarhash
+
+        Старые файлы скачивались по URL аватара профиля, поэтому считаются изображением
+        с этим hash. Возвращает путь в хранилище или None, если старого файла нет.
+        """
+        with self._lock:
+            for extension in self.EXTENSIONS:
+                legacy_path = os.path.join(self.avatars_dir, f"{steamid}{extension}")
+                if not os.path.exists(legacy_path):
+                    continue
+                try:
+                    os.makedirs(self.blobs_dir, exist_ok=True)
+                    blob_path = os.path.join(self.blobs_dir, f"{avatar_hash}{extension}")
+                    os.replace(legacy_path, blob_path)
+                    return blob_path
+                except OSError as e:
+                    print(f"Ошибка переноса аватара {legacy_path}: {e}")
+        return None
+
+    def find_avatar(self, steamid):
+        """Путь к аватару аккаунта: через индекс или старый файл {steamid}.jpg"""
+        blob_path = self.find_blob(self.get_hash(steamid))
+        if blob_path:
+            return blob_path
+        for extension in ('.png', '.jpg', '.jpeg'):
+            legacy_path = os.path.join(self.avatars_dir, f"{steamid}{extension}")
+            if os.path.exists(legacy_path):
+                return legacy_path
+        return None
+
+    def store_blob(self, avatar_hash, data, extension='.jpg'):
+        """Сохранение изображения в хранилище под его hash"""
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        blob_path = os.path.join(self.blobs_dir, f"{avatar_hash}{extension}")
+        temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, blob_path)
+        return blob_path
+
+    def flush(self):
+        """Сохранение индекса на диск"""
+        with self._lock:
+            if not self._dirty or self._index is None:
+                return
+            temp_path = self.index_path + ".tmp"
+            try:
+                os.makedirs(self.avatars_dir, exist_ok=True)
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._index, f, indent=4)
+                os.replace(temp_path, self.index_path)
+                self._dirty = False
+            except Exception as e:
+                print(f"Ошибка сохранения индекса аватаров: {e}")
+
+class SteamAPI:
+    PLAYER_SUMMARIES_URL = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
+    # GetPlayerSummaries принимает не более 100 SteamID за один запрос
+    SUMMARIES_BATCH_SIZE = 100
+
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+        self.api_key = self.config_manager.get_api_key()
+        self.session = self.create_session()
+        self._profiles = {}
+        self._profiles_lock = threading.Lock()
+        self._profile_requests = {}
+        self._avatar_requests = {}
+        self.avatar_store = AvatarStore(os.path.join(get_app_directory(), "accounts", "avatars"))
+
+    def create_session(self):
+        """Создание HTTP сессии с пулом keep-alive соединений и повторами"""
+        pool_size = int(self.config_manager.get_setting("http_pool_size"))
+        retries = JitteredRetry(
+            total=int(self.config_manager.get_setting("http_max_retries")),
+            connect=int(self.config_manager.get_setting("http_max_retries")),
+            read=0,
+            backoff_factor=float(self.config_manager.get_setting("http_backoff_factor")),
+            status_forcelist=(500, 502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retries)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Connection": "keep-alive"})
+        return session
+
+    def set_api_key(self, api_key):
+        """Установить API ключ"""
+        self.api_key = api_key
+        self.config_manager.set_api_key(api_key)
+
+    def get_steam_avatar(self, steamid, player_info=None):
+        """Получение аватара аккаунта Steam через официальный API"""
+        if not self.api_key:
+            return None
+        try:
+            if player_info is None:
+                player_info = self.get_profile(steamid)
+            cache_path = self.ensure_avatar(steamid, player_info)
+            if cache_path:
+                try:
+                    from PIL import Image
+                    image = Image.open(cache_path)
+                    image.load()
+                except Exception as e:
+                    print(f"Ошибка загрузки аватара из кэша: {e}")
+                    try:
+                        os.remove(cache_path)
+                    except:
+                        pass
+                    return None
+                if image.mode in ('RGBA', 'LA', 'P'):
+                    image = image.convert('RGB')
+                return image
+            return None
+        except Exception as e:
+            print(f"Ошибка получения аватара: {e}")
+            return None
+
+    def ensure_avatar(self, steamid, player_info, flush=True):
+        """Путь к актуальному аватару: изображение скачивается, только если его нет в хранилище"""
+        steamid = str(steamid)
+        cache_path = self.find_cached_avatar(steamid)
+        if not player_info or not self.is_avatar_stale(steamid, player_info):
+            return cache_path
+        avatar_hash = self.get_avatar_hash(player_info)
+        avatar_url = self.get_avatar_url(player_info)
+        if not avatar_hash or not avatar_url:
+            return cache_path
+        blob_path = self.avatar_store.find_blob(avatar_hash)
+        if not blob_path and self.avatar_store.get_hash(steamid) is None:
+            # Аватар, скачанный до появления индекса, не скачивается повторно
+            blob_path = self.avatar_store.adopt_legacy_file(steamid, avatar_hash)
+        if not blob_path:
+            blob_path = self.download_avatar(avatar_hash, avatar_url)
+        if not blob_path:
+            return cache_path
+        self.avatar_store.set_hash(steamid, avatar_hash, flush=flush)
+        return blob_path
+
+    def is_avatar_stale(self, steamid, player_info):
+        """Нужно ли обновить аватар: файла нет или avatarhash профиля отличается от кэша"""
+        steamid = str(steamid)
+        if not self.find_cached_avatar(steamid):
+            return True
+        avatar_hash = self.get_avatar_hash(player_info)
+        if not avatar_hash:
+            return False
+        return self.avatar_store.get_hash(steamid) != avatar_hash
+
+    @staticmethod
+    def get_avatar_hash(player_info):
+        """avatarhash из информации об игроке (или из имени файла в URL аватара)"""
+        if not player_info:
+            return None
+        if player_info.get('avatarhash'):
+            return player_info['avatarhash']
+        avatar_url = SteamAPI.get_avatar_url(player_info)
+        if avatar_url:
+            return os.path.basename(avatar_url).split('_')[0].split('.')[0] or None
+        return None
+
+    def flush_avatar_index(self):
+        """Сохранение индекса аватаров на диск"""
+        self.avatar_store.flush()
+
+    def get_avatars_dir(self):
+        """Путь к директории кэша аватаров"""
+        return self.avatar_store.avatars_dir
+
+    def find_cached_avatar(self, steamid):
+        """Поиск аватара аккаунта в локальном кэше"""
+        return self.avatar_store.find_avatar(steamid)
+
+    def download_avatar(self, avatar_hash, avatar_url):
+        """Загрузка изображения аватара в хранилище, возвращает путь к файлу"""
+        with self._profiles_lock:
+            future = self._avatar_requests.get(avatar_hash)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._avatar_requests[avatar_hash] = future
+        if not owner:
+            # Это изображение уже скачивается другим потоком (возможно, для другого аккаунта)
+            return future.result(timeout=60)
+        blob_path = None
+        try:
+            img_response = self.session.get(avatar_url, timeout=10)
+            if img_response.status_code == 200:
+                file_extension = '.png' if '.png' in avatar_url else '.jpg'
+                blob_path = self.avatar_store.store_blob(avatar_hash, img_response.content, file_extension)
+        finally:
+            with self._profiles_lock:
+                self._avatar_requests.pop(avatar_hash, None)
+            future.set_result(blob_path)
+        return blob_path
+
+    @staticmethod
+    def get_avatar_url(player_info):
+        """Выбор URL аватара наибольшего размера из информации об игроке"""
+        avatar_urls = [
+            player_info.get('avatarfull', ''),
+            player_info.get('avatarmedium', ''),
+            player_info.get('avatar', '')
+        ]
+        return next((url for url in avatar_urls if url), '')
+
+    def get_player_summaries(self, steamids, force=False):
+        """Пакетное получение информации об игроках (по 100 SteamID за запрос)"""
+        summaries = {}
+        if not self.api_key:
+            return summaries
+        unique_ids = []
+        seen = set()
+        for steamid in steamids:
+            steamid = str(steamid) if steamid else ''
+            if steamid.isdigit() and steamid not in seen:
+                seen.add(steamid)
+                unique_ids.append(steamid)
+        if not force:
+            cached = self.get_cached_profiles(unique_ids)
+            summaries.update(cached)
+            unique_ids = [steamid for steamid in unique_ids if steamid not in cached]
+        owned, waiting = self._claim_profiles(unique_ids)
+        for start in range(0, len(owned), self.SUMMARIES_BATCH_SIZE):
+            chunk = owned[start:start + self.SUMMARIES_BATCH_SIZE]
+            fetched = {}
+            try:
+                fetched = self._fetch_summaries(chunk)
+            finally:
+                self._release_profiles(chunk, fetched)
+            summaries.update(fetched)
+        # Профили, которые уже запрашиваются другим потоком, ждем, а не запрашиваем повторно
+        for steamid, future in waiting.items():
+            try:
+                player_info = future.result(timeout=60)
+            except Exception as e:
+                print(f"Ошибка ожидания профиля {steamid}: {e}")
+                continue
+            if player_info:
+                summaries[steamid] = player_info
+        return summaries
+
+    def _fetch_summaries(self, steamids):
+        """Один запрос GetPlayerSummaries для списка SteamID (не более 100)"""
+        summaries = {}
+        try:
+            params = {
+                'key': self.api_key,
+                'steamids': ','.join(steamids)
+            }
+            response = self.session.get(self.PLAYER_SUMMARIES_URL, params=params, timeout=10)
+            if response.status_code == 200:
+                data = response.json()
+                for player in data.get('response', {}).get('players', []):
+                    if player.get('steamid'):
+                        summaries[str(player['steamid'])] = player
+            else:
+                print(f"Ошибка пакетного запроса профилей: {response.status_code}")
+        except Exception as e:
+            print(f"Ошибка пакетного получения информации: {e}")
+        return summaries
+
+    def get_cached_profiles(self, steamids):
+        """Профили из кэша в памяти, не старше profile_cache_ttl"""
+        ttl = float(self.config_manager.get_setting("profile_cache_ttl"))
+        now = time.time()
+        cached = {}
+        with self._profiles_lock:
+            for steamid in steamids:
+                entry = self._profiles.get(str(steamid))
+                if entry and now - entry[0] < ttl:
+                    cached[str(steamid)] = entry[1]
+        return cached
+
+    def _claim_profiles(self, steamids):
+        """Регистрация запросов профилей: свои SteamID и ожидания чужих запросов"""
+        owned = []
+        waiting = {}
+        with self._profiles_lock:
+            for steamid in steamids:
+                future = self._profile_requests.get(steamid)
+                if future is None:
+                    self._profile_requests[steamid] = Future()
+                    owned.append(steamid)
+                else:
+                    waiting[steamid] = future
+        return owned, waiting
+
+    def _release_profiles(self, steamids, summaries):
+        """Сохранение результатов в кэш и пробуждение ожидающих потоков"""
+        now = time.time()
+        with self._profiles_lock:
+            futures = []
+            for steamid in steamids:
+                if steamid in summaries:
+                    self._profiles[steamid] = (now, summaries[steamid])
+                futures.append((self._profile_requests.pop(steamid, None), summaries.get(steamid)))
+        for future, player_info in futures:
+            if future is not None:
+                future.set_result(player_info)
+
+    def get_profile(self, steamid, force=False):
+        """Информация об игроке: один запрос на SteamID, параллельные вызовы ждут его результат"""
+        return self.get_player_summaries([steamid], force=force).get(str(steamid))
+
+    def get_player_info(self, steamid, force=False):
+        """Получение дополнительной информации об игроке"""
+        if not self.api_key:
+            return None
+        try:
+            return self.get_profile(steamid, force=force)
+        except Exception as e:
+            print(f"Ошибка получения информации: {e}")
+            return None
+
+    def validate_api_key(self):
+        """Проверка валидности API ключа"""
+        if not self.api_key:
+            return False, "API ключ не установлен"
+        try:
+            url = self.PLAYER_SUMMARIES_URL
+            params = {
+                'key': self.api_key,
+                'steamids': '76561197960435530'
+            }
+            response = self.session.get(url, params=params, timeout=10)
+            if response.status_code == 200:
+                return True, "API ключ валиден"
+            else:
+                return False, f"Ошибка API: {response.status_code}"
+        except Exception as e:
+            return False, f"Ошибка проверки API ключа: {e}"
+
+class AvatarPrefetcher:
+    """Фоновая предзагрузка аватаров с ограничением числа потоков"""
+    def __init__(self, steam_api, max_workers=4, on_progress=None):
+        self.steam_api = steam_api
+        self.max_workers = max(1, int(max_workers))
+        self.on_progress = on_progress
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._queued = set()
+        self._profiles = {}
+        self._generation = 0
+        self._active_workers = 0
+        self.total = 0
+        self.done = 0
+
+    def start(self, steamids, profiles):
+        """Запуск предзагрузки; steamids уже упорядочены по приоритету"""
+        with self._condition:
+            self._generation += 1
+            self._queue = deque(steamids)
+            self._queued = set(steamids)
+            self._profiles = dict(profiles)
+            self.total = len(steamids)
+            self.done = 0
+            # Счетчик меняется под тем же замком, под которым поток решает завершиться,
+            # поэтому уходящий поток не считается живым и новая очередь не остается без потоков
+            workers_needed = max(0, min(self.max_workers, len(steamids)) - self._active_workers)
+            self._active_workers += workers_needed
+        for _ in range(workers_needed):
+            Thread(target=self._worker, daemon=True).start()
+
+    def prioritize(self, steamids):
+        """Перемещение указанных SteamID в начало очереди (например, видимых строк)"""
+        with self._condition:
+            pending = [steamid for steamid in steamids if steamid in self._queued]
+            if not pending:
+                return
+            pending_set = set(pending)
+            rest = [steamid for steamid in self._queue if steamid not in pending_set]
+            self._queue = deque(pending + rest)
+
+    def cancel(self):
+        """Остановка текущей предзагрузки"""
+        with self._condition:
+            self._generation += 1
+            self._queue.clear()
+            self._queued.clear()
+
+    def _next_task(self):
+        """Следующий SteamID; при пустой очереди поток снимается со счета и должен завершиться"""
+        with self._condition:
+            if not self._queue:
+                self._active_workers -= 1
+                return None, None
+            steamid = self._queue.popleft()
+            self._queued.discard(steamid)
+            return steamid, self._generation
+
+    def _worker(self):
+        """Рабочий поток: загружает аватары из общей очереди"""
+        finished = False
+        try:
+            while True:
+                steamid, current_generation = self._next_task()
+                if steamid is None:
+                    finished = True
+                    break
+                player_info = self._profiles.get(steamid)
+                path = None
+                try:
+                    if player_info and self.steam_api.is_avatar_stale(steamid, player_info):
+                        path = self.steam_api.ensure_avatar(steamid, player_info, flush=False)
+                except Exception as e:
+                    print(f"Ошибка предзагрузки аватара {steamid}: {e}")
+                with self._condition:
+                    if current_generation != self._generation:
+                        continue
+                    self.done += 1
+                    done, total = self.done, self.total
+                if done % 50 == 0 or done == total:
+                    self.steam_api.flush_avatar_index()
+                if self.on_progress:
+                    self.on_progress(steamid, path, done, total)
+        finally:
+            if not finished:
+                with self._condition:
+                    self._active_workers -= 1
@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import hmac
+import struct
+import threading
+import time
+
+class SteamAuth:
+    """Генерация 2FA кодов Steam Guard с таблицей кодов на текущий временной шаг"""
+    CODE_CHARS = '23456789BCDFGHJKMNPQRTVWXY'
+    TIME_STEP = 30
+    _TIMESTEP_STRUCT = struct.Struct('>Q')
+    _CODE_STRUCT = struct.Struct('>I')
+
+    def __init__(self):
+        self._keys = {}
+        self._errors = {}
+        self._tables = {}
+        self._lock = threading.Lock()
+        # secret_resolver(acc_id) вызывается для аккаунтов без секрета (например, зашифрованных)
+        self.secret_resolver = None
+
+    @classmethod
+    def get_timestep(cls, timestamp=None):
+        """Номер 30-секундного временного шага Steam"""
+        if timestamp is None:
+            timestamp = time.time()
+        return int(timestamp) // cls.TIME_STEP
+
+    @staticmethod
+    def decode_secret(shared_secret):
+        """Декодирование shared_secret из base64 в ключ HMAC"""
+        return base64.b64decode(shared_secret + '===')
+
+    @staticmethod
+    def prepare_key(shared_secret):
+        """HMAC-SHA1 с уже обработанным ключом; копируется для каждого временного шага"""
+        return hmac.new(SteamAuth.decode_secret(shared_secret), digestmod=hashlib.sha1)
+
+    @classmethod
+    def code_from_key(cls, prepared_key, timestep):
+        """Вычисление кода по подготовленному ключу"""
+        mac = prepared_key.copy()
+        mac.update(cls._TIMESTEP_STRUCT.pack(timestep))
+        hmac_result = mac.digest()
+        start = hmac_result[19] & 0x0F
+        code_int = cls._CODE_STRUCT.unpack_from(hmac_result, start)[0] & 0x7FFFFFFF
+        chars = cls.CODE_CHARS
+        code = ''
+        for _ in range(5):
+            code_int, index = divmod(code_int, 26)
+            code += chars[index]
+        return code
+
+    def generate_2fa_code(self, shared_secret, timestamp=None):
+        """Генерация 2FA кода"""
+        try:
+            key = self.prepare_key(shared_secret)
+            return self.code_from_key(key, self.get_timestep(timestamp))
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    def load_secrets(self, secrets):
+        """Декодирование и проверка всех секретов {acc_id: shared_secret} один раз при загрузке"""
+        keys = {}
+        errors = {}
+        for acc_id, shared_secret in secrets.items():
+            try:
+                keys[acc_id] = self.prepare_key(shared_secret or '')
+            except Exception as e:
+                errors[acc_id] = f"Error: {str(e)}"
+        with self._lock:
+            self._keys = keys
+            self._errors = errors
+            self._tables = {}
+
+    def set_secret(self, acc_id, shared_secret):
+        """Добавление или замена секрета одного аккаунта"""
+        try:
+            key = self.prepare_key(shared_secret or '')
+            error = None
+        except Exception as e:
+            key = None
+            error = f"Error: {str(e)}"
+        with self._lock:
+            self._keys.pop(acc_id, None)
+            self._errors.pop(acc_id, None)
+            if key is not None:
+                self._keys[acc_id] = key
+            else:
+                self._errors[acc_id] = error
+            for table in self._tables.values():
+                table.pop(acc_id, None)
+
+    def remove_secret(self, acc_id):
+        """Удаление секрета аккаунта"""
+        with self._lock:
+            self._keys.pop(acc_id, None)
+            self._errors.pop(acc_id, None)
+            for table in self._tables.values():
+                table.pop(acc_id, None)
+
+    def _get_table(self, timestep):
+        """Таблица кодов шага; хранятся только текущий и следующий шаги (вызывать под _lock)"""
+        table = self._tables.get(timestep)
+        if table is None:
+            table = {}
+            self._tables[timestep] = table
+            for old_step in [step for step in self._tables if step < timestep - 1]:
+                del self._tables[old_step]
+        return table
+
+    def get_codes(self, timestep=None, acc_ids=None):
+        """Коды аккаунтов на временной шаг: один проход, дальше ответы из таблицы"""
+        if timestep is None:
+            timestep = self.get_timestep()
+        if acc_ids is not None:
+            return {acc_id: self.get_code(acc_id, timestep) for acc_id in acc_ids}
+        with self._lock:
+            table = self._get_table(timestep)
+            if len(table) < len(self._keys) + len(self._errors):
+                code_from_key = self.code_from_key
+                for acc_id, key in self._keys.items():
+                    if acc_id not in table:
+                        table[acc_id] = code_from_key(key, timestep)
+                table.update(self._errors)
+            return dict(table)
+
+    def get_code(self, acc_id, timestep=None):
+        """Код одного аккаунта (вычисляется при первом запросе на шаге)"""
+        if timestep is None:
+            timestep = self.get_timestep()
+        with self._lock:
+            table = self._get_table(timestep)
+            code = table.get(acc_id)
+            if code is None:
+                if acc_id in self._keys:
+                    code = self.code_from_key(self._keys[acc_id], timestep)
+                else:
+                    code = self._errors.get(acc_id)
+                if code is not None:
+                    table[acc_id] = code
+        if code is None and self.secret_resolver is not None:
+            self.secret_resolver(acc_id)
+        return code
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+class BackupStore:
+    """Инкрементальные резервные копии: файлы хранятся один раз по SHA-256, снимок - это манифест
+
+    backups/objects/ab/abcdef...     - содержимое файлов
+    backups/snapshots/YYYYmmdd_HHMMSS.json - {путь: [хэш, mtime_ns, размер]}
+    """
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, backups_dir):
+        self.backups_dir = backups_dir
+        self.objects_dir = os.path.join(backups_dir, "objects")
+        self.snapshots_dir = os.path.join(backups_dir, "snapshots")
+
+    def object_path(self, file_hash):
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash)
+
+    @classmethod
+    def hash_file(cls, path):
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(cls.HASH_CHUNK_SIZE), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def list_snapshots(self):
+        """Имена снимков от старых к новым"""
+        try:
+            names = os.listdir(self.snapshots_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def load_snapshot(self, name):
+        with open(os.path.join(self.snapshots_dir, f"{name}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def store_object(self, path, file_hash):
+        """Копирование файла в хранилище, если такого содержимого там еще нет"""
+        object_path = self.object_path(file_hash)
+        if os.path.exists(object_path):
+            return False
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, object_path)
+        return True
+
+    def create_snapshot(self, files, on_progress=None):
+        """Снимок набора файлов {относительный путь: абсолютный путь}
+
+        Хэши файлов с тем же mtime/размером берутся из предыдущего снимка без чтения.
+        Файлы, исчезнувшие во время копирования, пропускаются.
+        Возвращает (имя снимка или None, если ничего не изменилось, число новых объектов).
+        """
+        snapshots = self.list_snapshots()
+        previous = self.load_snapshot(snapshots[-1])['files'] if snapshots else {}
+        entries = {}
+        stored = 0
+        total = len(files)
+        for done, (relative_path, path) in enumerate(sorted(files.items()), 1):
+            try:
+                stat = os.stat(path)
+                cached = previous.get(relative_path)
+                if cached and cached[1] == stat.st_mtime_ns and cached[2] == stat.st_size \
+                        and os.path.exists(self.object_path(cached[0])):
+                    file_hash = cached[0]
+                else:
+                    file_hash = self.hash_file(path)
+                    stored += self.store_object(path, file_hash)
+                entries[relative_path] = [file_hash, stat.st_mtime_ns, stat.st_size]
+            except FileNotFoundError:
+                # Файл удален во время копирования (удаление пользователем, замена при шифровании)
+                print(f"Резервная копия: файл {relative_path} исчез, пропущен")
+            if on_progress:
+                on_progress(done, total)
+        if snapshots and {path: entry[0] for path, entry in entries.items()} == \
+                {path: entry[0] for path, entry in previous.items()}:
+            return None, 0
+        name = datetime.now().strftime('%Y%m%d_%H%M%S')
+        while name in snapshots:
+            name = f"{name}_1"
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        snapshot_path = os.path.join(self.snapshots_dir, f"{name}.json")
+        with open(snapshot_path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'created': datetime.now().isoformat(timespec='seconds'), 'files': entries}))
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+        return name, stored
+
+    def verify_snapshot(self, name, paths=None, full=True, on_progress=None):
+        """Проверка объектов снимка: {путь: 'missing' | 'corrupt'} для поврежденных
+
+        paths ограничивает проверку указанными путями снимка. full=False проверяет
+        только наличие и размер объектов, без пересчета хэшей.
+        """
+        files = self.load_snapshot(name)['files']
+        if paths is not None:
+            files = {path: files[path] for path in paths if path in files}
+        by_hash = {}
+        for relative_path, (file_hash, _, size) in files.items():
+            by_hash.setdefault(file_hash, (size, []))[1].append(relative_path)
+        problems = {}
+        total = len(by_hash)
+        for done, (file_hash, (size, paths)) in enumerate(by_hash.items(), 1):
+            object_path = self.object_path(file_hash)
+            try:
+                ok = os.path.getsize(object_path) == size and (not full or self.hash_file(object_path) == file_hash)
+                status = None if ok else 'corrupt'
+            except FileNotFoundError:
+                status = 'missing'
+            if status:
+                problems.update((path, status) for path in paths)
+            if on_progress:
+                on_progress(done, total)
+        return problems
+
+    def diff_snapshot(self, name, target_dir, paths=None):
+        """Файлы снимка, отличающиеся от target_dir: {путь: 'missing' | 'changed'}
+
+        Файл с тем же mtime и размером считается совпадающим; иначе сравнивается хэш.
+        """
+        files = self.load_snapshot(name)['files']
+        if paths is not None:
+            files = {path: files[path] for path in paths if path in files}
+        differences = {}
+        for relative_path, (file_hash, mtime, size) in files.items():
+            live_path = os.path.join(target_dir, *relative_path.split('/'))
+            try:
+                stat = os.stat(live_path)
+            except FileNotFoundError:
+                differences[relative_path] = 'missing'
+                continue
+            if stat.st_size != size:
+                differences[relative_path] = 'changed'
+            elif stat.st_mtime_ns != mtime and self.hash_file(live_path) != file_hash:
+                differences[relative_path] = 'changed'
+        return differences
+
+    def restore_snapshot(self, name, target_dir, paths=None, on_progress=None):
+        """Восстановление из снимка только отличающихся или отсутствующих файлов
+
+        paths ограничивает восстановление указанными путями снимка. Объект проверяется
+        по хэшу перед записью, файл заменяется атомарно. Возвращает (restored, errors).
+        """
+        files = self.load_snapshot(name)['files']
+        differences = self.diff_snapshot(name, target_dir, paths)
+        restored = []
+        errors = {}
+        total = len(differences)
+        for done, relative_path in enumerate(sorted(differences), 1):
+            file_hash, mtime, _ = files[relative_path]
+            live_path = os.path.join(target_dir, *relative_path.split('/'))
+            try:
+                object_path = self.object_path(file_hash)
+                if self.hash_file(object_path) != file_hash:
+                    raise ValueError("объект в хранилище поврежден")
+                os.makedirs(os.path.dirname(live_path), exist_ok=True)
+                temp_path = f"{live_path}.restore.tmp"
+                shutil.copyfile(object_path, temp_path)
+                os.utime(temp_path, ns=(mtime, mtime))
+                os.replace(temp_path, live_path)
+                restored.append(relative_path)
+            except Exception as e:
+                errors[relative_path] = str(e)
+            if on_progress:
+                on_progress(done, total)
+        return restored, errors
+
+    def prune(self, keep_last=10, keep_daily=30):
+        """Удаление старых снимков и объектов, на которые они больше не ссылаются
+
+        Сохраняются keep_last последних снимков и последний снимок каждого дня за keep_daily дней.
+        Возвращает (удалено снимков, удалено объектов).
+        """
+        snapshots = self.list_snapshots()
+        keep = set(snapshots[-keep_last:]) if keep_last > 0 else set()
+        days = {}
+        for name in snapshots:
+            days[name[:8]] = name
+        if keep_daily > 0:
+            keep.update(days[day] for day in sorted(days)[-keep_daily:])
+        removed_snapshots = 0
+        for name in snapshots:
+            if name not in keep:
+                os.remove(os.path.join(self.snapshots_dir, f"{name}.json"))
+                removed_snapshots += 1
+        if not removed_snapshots:
+            return 0, 0
+        referenced = set()
+        for name in keep:
+            referenced.update(entry[0] for entry in self.load_snapshot(name)['files'].values())
+        removed_objects = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if filename not in referenced:
+                    os.remove(os.path.join(dirpath, filename))
+                    removed_objects += 1
+        return removed_snapshots, removed_objects
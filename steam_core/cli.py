@@ -0,0 +1,326 @@
+"""Командная строка: python -m steam_core <команда>
+
+Использует только ядро, поэтому работает без дисплея и не импортирует tkinter и PIL.
+"""
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from .accounts import AccountManager
+from .auth import SteamAuth
+from .config import ConfigManager
+
+def _load_accounts(manager, config, names=None):
+    """Аккаунты {acc_id: AccountRecord}: все или только перечисленные"""
+    # Сообщения ядра о загрузке не должны смешиваться с выводом команды
+    with contextlib.redirect_stdout(sys.stderr):
+        if names:
+            accounts, errors = manager.load_account_files([f"{name}.maFile" for name in names])
+            missing = [name for name in names if name not in accounts and f"{name}.maFile" not in errors]
+            for name in missing:
+                errors[f"{name}.maFile"] = "аккаунт не найден"
+        else:
+            accounts, errors = manager.load_all_accounts(
+                max_workers=config.get_setting("account_load_workers"))
+    for filename, error in errors.items():
+        print(f"{filename}: {error}", file=sys.stderr)
+    return accounts, errors
+
+def _unlock(manager, args):
+    """Пароль хранилища из переменной окружения или с терминала"""
+    if manager.vault.unlocked:
+        return True
+    password = os.environ.get(args.password_env) if args.password_env else None
+    if password is None and sys.stdin.isatty():
+        password = getpass.getpass("Пароль шифрования: ")
+    if not password:
+        print("Хранилище зашифровано: укажите пароль через --password-env", file=sys.stderr)
+        return False
+    try:
+        if manager.unlock_vault(password):
+            return True
+    except Exception as e:
+        print(f"Ошибка разблокировки: {e}", file=sys.stderr)
+        return False
+    print("Неверный пароль шифрования", file=sys.stderr)
+    return False
+
+def cmd_list(args, config, manager):
+    accounts, _ = _load_accounts(manager, config)
+    rows = [{'account': acc_id, 'account_name': record.account_name, 'steamid': record.steamid,
+             'encrypted': record.encrypted}
+            for acc_id, record in sorted(accounts.items())]
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False))
+    else:
+        for row in rows:
+            locked = " [зашифрован]" if row['encrypted'] else ""
+            print(f"{row['account']}\t{row['steamid'] or '-'}{locked}")
+    return 0
+
+def _account_secrets(manager, accounts):
+    """Секреты {acc_id: shared_secret} и ошибки; зашифрованные maFiles расшифровываются"""
+    shared_secrets = {}
+    errors = {}
+    for acc_id, record in accounts.items():
+        try:
+            shared_secret = manager.decrypt_account(record).get('shared_secret') if record.locked \
+                else record.shared_secret
+        except Exception as e:
+            errors[acc_id] = str(e)
+            continue
+        if shared_secret:
+            shared_secrets[acc_id] = shared_secret
+        else:
+            errors[acc_id] = "нет shared_secret"
+    return shared_secrets, errors
+
+def cmd_codes(args, config, manager):
+    accounts, errors = _load_accounts(manager, config, args.accounts)
+    status = 1 if errors else 0
+    if any(record.locked for record in accounts.values()) and not _unlock(manager, args):
+        return 1
+    shared_secrets, errors = _account_secrets(manager, accounts)
+    auth = SteamAuth()
+    now = time.time()
+    seconds_left = auth.TIME_STEP - int(now) % auth.TIME_STEP
+    rows = []
+    for acc_id in sorted(accounts):
+        code = auth.generate_2fa_code(shared_secrets[acc_id], now) if acc_id in shared_secrets \
+            else errors[acc_id]
+        if acc_id not in shared_secrets or code.startswith("Error"):
+            print(f"{acc_id}: {code}", file=sys.stderr)
+            status = 1
+            continue
+        rows.append({'account': acc_id, 'code': code, 'seconds_left': seconds_left})
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False))
+    else:
+        for row in rows:
+            print(f"{row['account']}\t{row['code']}\t{row['seconds_left']}с")
+    return status
+
+def cmd_import(args, config, manager):
+    accounts, _ = _load_accounts(manager, config)
+    report = manager.bulk_import(args.paths, existing_steamids=[record.steamid for record in accounts.values()],
+                                 max_workers=config.get_setting("import_workers"))
+    for acc_id in sorted(report['imported']):
+        print(f"Импортирован: {acc_id}")
+    for name in report['duplicates']:
+        print(f"Дубликат: {name}", file=sys.stderr)
+    for name, error in report['errors'].items():
+        print(f"{name}: {error}", file=sys.stderr)
+    print(f"Импортировано: {len(report['imported'])}, дубликатов: {len(report['duplicates'])}, "
+          f"ошибок: {len(report['errors'])}")
+    return 1 if report['errors'] else 0
+
+def cmd_export(args, config, manager):
+    accounts, errors = _load_accounts(manager, config, args.accounts)
+    if errors and args.accounts:
+        return 1
+    if args.avatars:
+        # requests нужен только для поиска кэшированных аватаров
+        from .api import SteamAPI
+        manager.set_steam_api(SteamAPI(config))
+    try:
+        count, errors = manager.export_accounts(dict(sorted(accounts.items())), args.output,
+                                                include_avatars=args.avatars)
+    except Exception as e:
+        print(f"Ошибка экспорта: {e}", file=sys.stderr)
+        return 1
+    for acc_id, error in errors.items():
+        print(f"{acc_id}: {error}", file=sys.stderr)
+    print(f"Экспортировано аккаунтов: {count} -> {args.output}")
+    return 1 if errors else 0
+
+def cmd_backup(args, config, manager):
+    keep_last = args.keep_last if args.keep_last is not None else int(config.get_setting("backup_keep_last"))
+    keep_daily = args.keep_daily if args.keep_daily is not None else int(config.get_setting("backup_keep_daily"))
+    success, message = manager.backup_accounts(keep_last=keep_last, keep_daily=keep_daily)
+    print(message, file=sys.stdout if success else sys.stderr)
+    return 0 if success else 1
+
+def _snapshot_name(store, name):
+    """Имя снимка: указанное или последнее"""
+    if name:
+        return name
+    snapshots = store.list_snapshots()
+    if not snapshots:
+        print("Резервных копий пока нет", file=sys.stderr)
+        return None
+    return snapshots[-1]
+
+def cmd_verify(args, config, manager):
+    store = manager.get_backup_store()
+    name = _snapshot_name(store, args.snapshot)
+    if name is None:
+        return 1
+    try:
+        problems = store.verify_snapshot(name, full=not args.quick)
+        total = len(store.load_snapshot(name)['files'])
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения резервной копии {name}: {e}", file=sys.stderr)
+        return 1
+    for path, status in sorted(problems.items()):
+        print(f"{path}: {'отсутствует' if status == 'missing' else 'поврежден'}", file=sys.stderr)
+    print(f"Резервная копия {name}: файлов {total}, повреждено: {len(problems)}")
+    return 1 if problems else 0
+
+def cmd_restore(args, config, manager):
+    store = manager.get_backup_store()
+    name = _snapshot_name(store, args.snapshot)
+    if name is None:
+        return 1
+    try:
+        files = store.load_snapshot(name)['files']
+        unknown = [path for path in args.paths if path not in files]
+        differences = store.diff_snapshot(name, manager.accounts_dir, args.paths or None)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения резервной копии {name}: {e}", file=sys.stderr)
+        return 1
+    for path in unknown:
+        print(f"{path}: нет в резервной копии {name}", file=sys.stderr)
+    if args.dry_run:
+        for path, status in sorted(differences.items()):
+            print(f"{path}\t{'отсутствует' if status == 'missing' else 'изменен'}")
+        print(f"Отличается файлов: {len(differences)}")
+        return 1 if unknown else 0
+    restored, errors = store.restore_snapshot(name, manager.accounts_dir, list(differences))
+    for path in restored:
+        print(f"Восстановлен: {path}")
+    for path, error in sorted(errors.items()):
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"Восстановлено файлов: {len(restored)}, ошибок: {len(errors)}")
+    return 1 if errors or unknown else 0
+
+def cmd_serve(args, config, manager):
+    # http.server и ctypes нужны только серверу: остальные команды их не импортируют
+    from .server import CodeServer
+    from .watcher import AccountsWatcher
+    accounts, _ = _load_accounts(manager, config)
+    if any(record.locked for record in accounts.values()) and not _unlock(manager, args):
+        return 1
+    auth = SteamAuth()
+    shared_secrets, _ = _account_secrets(manager, accounts)
+    auth.load_secrets(shared_secrets)
+    token = os.environ.get(args.token_env) if args.token_env else config.get_code_server_token()
+    try:
+        server = CodeServer(auth, token,
+                            host=args.host or config.get_setting("code_server_host"),
+                            port=args.port if args.port is not None else int(config.get_setting("code_server_port")),
+                            unix_socket=args.socket or config.get_setting("code_server_socket") or None)
+        server.set_accounts(accounts)
+        with contextlib.redirect_stdout(sys.stderr):
+            server.start()
+    except (OSError, ValueError) as e:
+        print(f"Ошибка запуска сервера кодов: {e}", file=sys.stderr)
+        return 1
+    if not args.token_env:
+        print(f"Токен доступа: code_server_token в {config.config_file}", file=sys.stderr)
+
+    def on_change(changed, removed):
+        """Новые и измененные maFiles подхватываются без перезапуска сервера"""
+        with contextlib.redirect_stdout(sys.stderr):
+            if changed is None:
+                accounts, _ = manager.load_all_accounts(max_workers=config.get_setting("account_load_workers"))
+                auth.load_secrets(_account_secrets(manager, accounts)[0])
+                server.set_accounts(accounts)
+                return
+            accounts, _ = manager.load_account_files(changed)
+            shared_secrets, _ = _account_secrets(manager, accounts)
+            removed_ids = [filename[:-len('.maFile')] for filename in removed]
+            for acc_id in removed_ids:
+                auth.remove_secret(acc_id)
+            for acc_id in accounts:
+                if acc_id in shared_secrets:
+                    auth.set_secret(acc_id, shared_secrets[acc_id])
+                else:
+                    auth.remove_secret(acc_id)
+            server.remove_accounts(removed_ids)
+            server.update_accounts(accounts)
+
+    watcher = AccountsWatcher(manager.accounts_dir, on_change,
+                              poll_interval=float(config.get_setting("accounts_poll_interval")))
+    with contextlib.redirect_stdout(sys.stderr):
+        watcher.start()
+    # SIGTERM от менеджера служб завершает сервер так же, как Ctrl+C: сокет удаляется
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        server.stop()
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="steam_core", description="Steam Account Manager без GUI")
+    parser.add_argument("--accounts-dir", default="accounts",
+                        help="каталог maFiles (по умолчанию accounts рядом с приложением)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="список аккаунтов")
+    list_parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    list_parser.set_defaults(handler=cmd_list)
+
+    codes_parser = subparsers.add_parser("codes", help="текущие коды Steam Guard")
+    codes_parser.add_argument("accounts", nargs="*", metavar="ACCOUNT", help="аккаунты (по умолчанию все)")
+    codes_parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    codes_parser.add_argument("--password-env", metavar="VAR",
+                              help="переменная окружения с паролем зашифрованного хранилища")
+    codes_parser.set_defaults(handler=cmd_codes)
+
+    import_parser = subparsers.add_parser("import", help="импорт maFiles из файлов, папок и zip-архивов")
+    import_parser.add_argument("paths", nargs="+", metavar="PATH")
+    import_parser.set_defaults(handler=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="экспорт аккаунтов в zip/tar архив")
+    export_parser.add_argument("accounts", nargs="*", metavar="ACCOUNT", help="аккаунты (по умолчанию все)")
+    export_parser.add_argument("-o", "--output", required=True, help="файл архива (.zip, .tar, .tar.gz, .tar.xz)")
+    export_parser.add_argument("--avatars", action="store_true", help="добавить кэшированные аватары")
+    export_parser.set_defaults(handler=cmd_export)
+
+    backup_parser = subparsers.add_parser("backup", help="инкрементальная резервная копия")
+    backup_parser.add_argument("--keep-last", type=int, help="сколько последних копий хранить")
+    backup_parser.add_argument("--keep-daily", type=int, help="сколько дней хранить по одной копии")
+    backup_parser.set_defaults(handler=cmd_backup)
+
+    verify_parser = subparsers.add_parser("verify", help="проверка целостности резервной копии")
+    verify_parser.add_argument("snapshot", nargs="?", metavar="SNAPSHOT", help="снимок (по умолчанию последний)")
+    verify_parser.add_argument("--quick", action="store_true", help="только наличие и размер, без хэшей")
+    verify_parser.set_defaults(handler=cmd_verify)
+
+    restore_parser = subparsers.add_parser("restore", help="восстановление отличающихся файлов из резервной копии")
+    restore_parser.add_argument("snapshot", nargs="?", metavar="SNAPSHOT", help="снимок (по умолчанию последний)")
+    restore_parser.add_argument("--path", dest="paths", action="append", default=[], metavar="PATH",
+                                help="восстановить только этот файл снимка (можно повторять)")
+    restore_parser.add_argument("--dry-run", action="store_true", help="только показать отличающиеся файлы")
+    restore_parser.set_defaults(handler=cmd_restore)
+
+    serve_parser = subparsers.add_parser("serve", help="локальный сервер кодов (HTTP или Unix-сокет)")
+    serve_parser.add_argument("--host", help="адрес localhost (по умолчанию из config.json)")
+    serve_parser.add_argument("--port", type=int, help="порт (по умолчанию из config.json)")
+    serve_parser.add_argument("--socket", metavar="PATH", help="Unix-сокет вместо TCP")
+    serve_parser.add_argument("--token-env", metavar="VAR",
+                              help="переменная окружения с токеном (по умолчанию токен из config.json)")
+    serve_parser.add_argument("--password-env", metavar="VAR",
+                              help="переменная окружения с паролем зашифрованного хранилища")
+    serve_parser.set_defaults(handler=cmd_serve)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manager = AccountManager(args.accounts_dir)
+    try:
+        return args.handler(args, ConfigManager(), manager)
+    finally:
+        # Отложенные записи (например, дописанные SteamID) иначе теряются вместе с фоновым потоком
+        with contextlib.redirect_stdout(sys.stderr):
+            manager.close()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import secrets
+import time
+
+from .paths import get_app_directory
+
+class ConfigManager:
+    DEFAULT_CONFIG = {
+        "steam_api_key": "",
+        "window_geometry": "1100x750",
+        "http_pool_size": 10,
+        "http_max_retries": 3,
+        "http_backoff_factor": 0.5,
+        "avatar_prefetch_workers": 4,
+        "profile_cache_ttl": 600,
+        "avatar_photo_cache_size": 64,
+        "virtual_list": "auto",
+        "virtual_list_threshold": 2000,
+        "account_load_workers": 1,
+        "import_workers": 8,
+        "account_load_chunk_size": 500,
+        "accounts_watcher": True,
+        "accounts_poll_interval": 2.0,
+        "backup_keep_last": 10,
+        "backup_keep_daily": 30,
+        "code_server": False,
+        "code_server_host": "127.0.0.1",
+        "code_server_port": 27080,
+        "code_server_socket": "",
+        "code_server_token": "",
+        "api_key_validation_ttl": 86400
+    }
+
+    def __init__(self):
+        self.app_dir = get_app_directory()
+        self.config_file = os.path.join(self.app_dir, "config.json")
+        self.config = self.load_config()
+
+    def load_config(self):
+        """Загрузка конфигурации из файла"""
+        default_config = dict(self.DEFAULT_CONFIG)
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                    return {**default_config, **config}
+            except Exception as e:
+                print(f"Ошибка загрузки конфигурации: {e}")
+                return default_config
+        else:
+            return default_config
+
+    def save_config(self):
+        """Сохранение конфигурации в файл"""
+        try:
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(self.config, f, indent=4, ensure_ascii=False)
+            return True
+        except Exception as e:
+            print(f"Ошибка сохранения конфигурации: {e}")
+            return False
+
+    def get_setting(self, key):
+        """Получить значение настройки (или значение по умолчанию)"""
+        return self.config.get(key, self.DEFAULT_CONFIG.get(key))
+
+    def get_api_key(self):
+        """Получить API ключ"""
+        return self.config.get("steam_api_key", "")
+
+    def set_api_key(self, api_key):
+        """Установить API ключ"""
+        self.config["steam_api_key"] = api_key
+        return self.save_config()
+
+    @staticmethod
+    def get_api_key_fingerprint(api_key):
+        """Отпечаток ключа: в кэше проверки хранится он, а не сам ключ"""
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+    def is_api_key_validated(self, api_key):
+        """Ключ успешно проверялся не раньше api_key_validation_ttl секунд назад"""
+        validation = self.config.get("api_key_validation") or {}
+        age = time.time() - validation.get("time", 0)
+        return (validation.get("key") == self.get_api_key_fingerprint(api_key)
+                and 0 <= age < float(self.get_setting("api_key_validation_ttl")))
+
+    def set_api_key_validated(self, api_key):
+        """Запомнить успешную проверку ключа, чтобы не проверять его при каждом запуске"""
+        self.config["api_key_validation"] = {"key": self.get_api_key_fingerprint(api_key),
+                                             "time": int(time.time())}
+        return self.save_config()
+
+    def get_code_server_token(self):
+        """Токен сервера кодов; при первом обращении создается и сохраняется"""
+        token = self.config.get("code_server_token")
+        if not token:
+            token = secrets.token_urlsafe(32)
+            self.config["code_server_token"] = token
+            self.save_config()
+        return token
+
+    def get_window_geometry(self):
+        """Получить геометрию окна"""
+        return self.config.get("window_geometry", "1100x750")
+
+    def set_window_geometry(self, geometry):
+        """Установить геометрию окна"""
+        self.config["window_geometry"] = geometry
+        return self.save_config()
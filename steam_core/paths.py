@@ -0,0 +1,9 @@
+import os
+import sys
+
+def get_app_directory():
+    """Получить путь к директории приложения (рядом с EXE)"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    else:
+        return os.path.abspath(".")
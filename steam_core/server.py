@@ -0,0 +1,281 @@
+import hmac
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, unquote, urlsplit
+
+class _CodeRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 с keep-alive: боты держат одно соединение и не платят за TCP-рукопожатие"""
+    protocol_version = "HTTP/1.1"
+    server_version = "SteamCodeServer"
+    # Заголовки и тело уходят одной записью: иначе Nagle и отложенный ACK дают ~40 мс на ответ
+    wbufsize = -1
+
+    def do_GET(self):
+        self.server.code_server.dispatch(self, 'GET')
+
+    def do_POST(self):
+        self.server.code_server.dispatch(self, 'POST')
+
+    def log_message(self, format, *args):
+        pass
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, getattr(socketserver, 'UnixStreamServer', object)):
+    daemon_threads = True
+
+class CodeServer:
+    """Локальный сервер 2FA кодов поверх SteamAuth
+
+    GET /code/<аккаунт>                - код по имени аккаунта, имени maFile или SteamID
+    GET /codes?accounts=a,b            - коды нескольких аккаунтов (без параметра - всех)
+    POST /codes {"accounts": [...]}    - то же для длинных списков
+
+    Доступ только с токеном: заголовок "Authorization: Bearer <токен>" или "X-Auth-Token".
+    Коды берутся из таблицы временного шага: на новом шаге таблица SteamAuth заполняется
+    один раз для всех аккаунтов, дальше ответ - поиск в словаре.
+    """
+    LOOPBACK_HOSTS = ('127.0.0.1', '::1', 'localhost')
+    LOCKED_ERROR = "аккаунт зашифрован, код еще не расшифрован"
+    MAX_BODY_SIZE = 1024 * 1024
+
+    def __init__(self, auth, token, host='127.0.0.1', port=27080, unix_socket=None):
+        if not token:
+            raise ValueError("Для сервера кодов нужен токен доступа")
+        if unix_socket is None and host not in self.LOOPBACK_HOSTS:
+            raise ValueError(f"Сервер кодов слушает только localhost, а не {host}")
+        self.auth = auth
+        self.token = token.encode('utf-8')
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # {псевдоним: acc_id} и {acc_id: (account_name, steamid)}; словари заменяются целиком
+        self._aliases = {}
+        self._accounts = {}
+        # (шаг, {acc_id: код}); кортеж заменяется целиком
+        self._cache = (None, {})
+
+    @property
+    def address(self):
+        if self.unix_socket:
+            return self.unix_socket
+        if self._server is not None:
+            return f"http://{self.host}:{self._server.server_address[1]}"
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Запуск сервера в фоновом потоке"""
+        if self._server is not None:
+            return
+        if self.unix_socket:
+            if not hasattr(socket, 'AF_UNIX'):
+                raise OSError("Unix-сокеты не поддерживаются на этой системе")
+            self._remove_stale_socket()
+            # Сокет создается сразу с правами 0600: после bind нет окна с правами по umask
+            old_umask = os.umask(0o177)
+            try:
+                server = _UnixHTTPServer(self.unix_socket, _CodeRequestHandler)
+            finally:
+                os.umask(old_umask)
+        else:
+            server_class = ThreadingHTTPServer
+            if ':' in self.host:
+                server_class = type('ThreadingHTTPServerV6', (ThreadingHTTPServer,),
+                                    {'address_family': socket.AF_INET6})
+            server = server_class((self.host, self.port), _CodeRequestHandler)
+        server.code_server = self
+        self._server = server
+        self._thread = Thread(target=server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Сервер кодов: {self.address}")
+
+    def _remove_stale_socket(self):
+        """Удаление сокета от прошлого запуска; другой файл по этому пути не трогается"""
+        try:
+            mode = os.lstat(self.unix_socket).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise OSError(f"{self.unix_socket} существует и не является сокетом")
+        os.remove(self.unix_socket)
+
+    def stop(self):
+        """Остановка сервера и удаление файла сокета"""
+        server, self._server = self._server, None
+        if server is None:
+            return
+        server.shutdown()
+        server.server_close()
+        if self.unix_socket:
+            try:
+                os.remove(self.unix_socket)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _account_aliases(acc_id, account):
+        aliases = {acc_id, acc_id.lower()}
+        if account.account_name:
+            aliases.add(account.account_name.lower())
+        if account.steamid:
+            aliases.add(str(account.steamid))
+        return aliases
+
+    def set_accounts(self, accounts):
+        """Полная замена индекса аккаунтов {acc_id: AccountRecord}"""
+        aliases = {}
+        info = {}
+        for acc_id, account in accounts.items():
+            info[acc_id] = (account.account_name or acc_id, account.steamid)
+            for alias in self._account_aliases(acc_id, account):
+                aliases.setdefault(alias, acc_id)
+        with self._lock:
+            self._aliases = aliases
+            self._accounts = info
+            self._cache = (None, {})
+
+    def update_accounts(self, accounts):
+        """Добавление или замена отдельных аккаунтов в индексе"""
+        with self._lock:
+            aliases = self._drop_aliases(accounts)
+            info = dict(self._accounts)
+            for acc_id, account in accounts.items():
+                info[acc_id] = (account.account_name or acc_id, account.steamid)
+                for alias in self._account_aliases(acc_id, account):
+                    aliases.setdefault(alias, acc_id)
+            self._aliases = aliases
+            self._accounts = info
+            self._cache = (None, {})
+
+    def remove_accounts(self, acc_ids):
+        """Удаление аккаунтов из индекса"""
+        with self._lock:
+            aliases = self._drop_aliases(acc_ids)
+            info = dict(self._accounts)
+            for acc_id in acc_ids:
+                info.pop(acc_id, None)
+            self._aliases = aliases
+            self._accounts = info
+            self._cache = (None, {})
+
+    def _drop_aliases(self, acc_ids):
+        """Копия псевдонимов без перечисленных аккаунтов (вызывать под _lock)"""
+        acc_ids = set(acc_ids)
+        return {alias: acc_id for alias, acc_id in self._aliases.items() if acc_id not in acc_ids}
+
+    def resolve(self, key):
+        """acc_id по имени аккаунта, имени maFile или SteamID"""
+        aliases = self._aliases
+        return aliases.get(key) or aliases.get(key.lower())
+
+    def _codes_table(self, timestep):
+        """Коды всех аккаунтов на шаг: считаются один раз при первом запросе шага"""
+        # Шаг и таблица читаются одной парой: на границе шага соседний запрос может подменить кэш
+        cached_timestep, table = self._cache
+        if cached_timestep == timestep:
+            return table
+        with self._lock:
+            cached_timestep, table = self._cache
+            if cached_timestep != timestep:
+                table = self.auth.get_codes(timestep)
+                self._cache = (timestep, table)
+        return table
+
+    def lookup(self, key, timestep):
+        """(acc_id, код, ошибка) для одного запрошенного аккаунта"""
+        acc_id = self.resolve(key)
+        if acc_id is None:
+            return None, None, "аккаунт не найден"
+        code = self._codes_table(timestep).get(acc_id)
+        if code is None:
+            # Аккаунт мог получить секрет после заполнения таблицы (например, после расшифровки)
+            code = self.auth.get_code(acc_id, timestep)
+        if code is None:
+            return acc_id, None, self.LOCKED_ERROR
+        if code.startswith("Error"):
+            return acc_id, None, code
+        return acc_id, code, None
+
+    def is_authorized(self, handler):
+        header = handler.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else handler.headers.get('X-Auth-Token', '')
+        return hmac.compare_digest(token.encode('utf-8'), self.token)
+
+    def dispatch(self, handler, method):
+        """Разбор запроса и отправка JSON-ответа"""
+        if not self.is_authorized(handler):
+            handler.close_connection = True
+            return self._send(handler, 401, {'error': "неверный токен"})
+        url = urlsplit(handler.path)
+        now = time.time()
+        timestep = int(now) // self.auth.TIME_STEP
+        seconds_left = self.auth.TIME_STEP - int(now) % self.auth.TIME_STEP
+        if url.path.startswith('/code/') and method == 'GET':
+            acc_id, code, error = self.lookup(unquote(url.path[len('/code/'):]), timestep)
+            if acc_id is None:
+                return self._send(handler, 404, {'error': error})
+            account_name, steamid = self._accounts.get(acc_id, (acc_id, None))
+            if error:
+                # 423: код появится после расшифровки maFile, запрос стоит повторить
+                return self._send(handler, 423 if error == self.LOCKED_ERROR else 500,
+                                  {'account': acc_id, 'account_name': account_name, 'steamid': steamid,
+                                   'error': error})
+            return self._send(handler, 200, {'account': acc_id, 'account_name': account_name, 'steamid': steamid,
+                                             'code': code, 'seconds_left': seconds_left})
+        if url.path == '/codes':
+            if method == 'POST':
+                keys = self._read_keys(handler)
+                if keys is None:
+                    handler.close_connection = True
+                    return self._send(handler, 400, {'error': "ожидается JSON {\"accounts\": [...]}"})
+            else:
+                query = parse_qs(url.query)
+                keys = [key for value in query.get('accounts', []) + query.get('account', [])
+                        for key in value.split(',') if key]
+            if not keys:
+                keys = list(self._accounts)
+            codes = {}
+            errors = {}
+            for key in keys:
+                _, code, error = self.lookup(key, timestep)
+                if error:
+                    errors[key] = error
+                else:
+                    codes[key] = code
+            return self._send(handler, 200, {'codes': codes, 'errors': errors, 'seconds_left': seconds_left})
+        return self._send(handler, 404, {'error': "неизвестный адрес"})
+
+    def _read_keys(self, handler):
+        """Список аккаунтов из тела POST: {"accounts": [...]} или просто [...]"""
+        try:
+            length = int(handler.headers.get('Content-Length') or 0)
+        except ValueError:
+            return None
+        if length <= 0 or length > self.MAX_BODY_SIZE:
+            return None
+        try:
+            data = json.loads(handler.rfile.read(length))
+        except ValueError:
+            return None
+        if isinstance(data, dict):
+            data = data.get('accounts')
+        if not isinstance(data, list):
+            return None
+        return [str(key) for key in data]
+
+    @staticmethod
+    def _send(handler, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
@@ -0,0 +1,308 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+
+_crypto = None
+
+def _load_crypto():
+    """Модули cryptography: импортируются при первом обращении к шифрованию"""
+    global _crypto
+    if _crypto is None:
+        try:
+            from cryptography.hazmat.primitives import padding
+            from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+            _crypto = (Cipher, algorithms, modes, padding)
+        except ImportError:
+            _crypto = False
+    return _crypto or None
+
+class MaFileVault:
+    """Зашифрованные maFiles в формате Steam Desktop Authenticator
+
+    manifest.json хранит для каждого файла соль и IV, файл - base64 от AES-256-CBC (PKCS7)
+    над JSON. Ключ - PBKDF2-HMAC-SHA1 от пароля; ключи кэшируются по соли, а новые файлы
+    шифруются одной солью сессии, поэтому ключ для них вычисляется один раз.
+    """
+    MANIFEST_FILE = "manifest.json"
+    KDF_ITERATIONS = 50000
+    SALT_LENGTH = 8
+    IV_LENGTH = 16
+    KEY_SIZE = 32
+
+    def __init__(self, accounts_dir):
+        self.accounts_dir = accounts_dir
+        self.manifest_path = os.path.join(accounts_dir, self.MANIFEST_FILE)
+        self._lock = threading.RLock()
+        self._manifest = None
+        self._manifest_mtime = None
+        self._entries = {}
+        self._password = None
+        self._keys = {}
+        self._session_salt = None
+
+    @staticmethod
+    def is_available():
+        return _load_crypto() is not None
+
+    def _require_crypto(self):
+        crypto = _load_crypto()
+        if crypto is None:
+            raise RuntimeError("Для шифрования требуется пакет cryptography")
+        return crypto
+
+    def load_manifest(self):
+        """Манифест SDA (перечитывается, только если файл изменился)"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                self._manifest, self._manifest_mtime, self._entries = {}, None, {}
+                return self._manifest
+            if mtime != self._manifest_mtime:
+                try:
+                    with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                except Exception as e:
+                    print(f"Ошибка чтения {self.MANIFEST_FILE}: {e}")
+                    manifest = {}
+                self._manifest = manifest
+                self._manifest_mtime = mtime
+                self._entries = {entry.get('filename'): entry for entry in manifest.get('entries') or []
+                                 if isinstance(entry, dict)}
+            return self._manifest
+
+    def is_encrypted(self):
+        return bool(self.load_manifest().get('encrypted'))
+
+    def is_encrypted_file(self, filename):
+        """Зашифрован ли maFile (есть соль и IV в манифесте); манифест берется из кэша"""
+        if self._manifest is None:
+            self.load_manifest()
+        if not self._manifest.get('encrypted'):
+            return False
+        entry = self._entries.get(filename)
+        return bool(entry and entry.get('encryption_iv') and entry.get('encryption_salt'))
+
+    def get_list_fields(self, filename):
+        """Поля списка, доступные без расшифровки"""
+        entry = self._entries.get(filename) or {}
+        fields = {'encrypted': True}
+        if entry.get('steamid'):
+            fields['steamid'] = str(entry['steamid'])
+        return fields
+
+    @property
+    def unlocked(self):
+        return self._password is not None
+
+    def _derive_key(self, salt, iterations):
+        key_id = (salt, iterations)
+        key = self._keys.get(key_id)
+        if key is None:
+            key = hashlib.pbkdf2_hmac('sha1', self._password, salt, iterations, self.KEY_SIZE)
+            self._keys[key_id] = key
+        return key
+
+    def _decrypt(self, text, entry):
+        Cipher, algorithms, modes, padding = self._require_crypto()
+        if not self.unlocked:
+            raise RuntimeError("Хранилище заблокировано")
+        salt = base64.b64decode(entry['encryption_salt'])
+        iv = base64.b64decode(entry['encryption_iv'])
+        key = self._derive_key(salt, int(entry.get('encryption_iterations', self.KDF_ITERATIONS)))
+        decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+        padded = decryptor.update(base64.b64decode(text)) + decryptor.finalize()
+        unpadder = padding.PKCS7(128).unpadder()
+        return (unpadder.update(padded) + unpadder.finalize()).decode('utf-8')
+
+    def _encrypt(self, plaintext):
+        """Шифрование солью сессии: (base64 текст, поля записи манифеста)"""
+        Cipher, algorithms, modes, padding = self._require_crypto()
+        if not self.unlocked:
+            raise RuntimeError("Хранилище заблокировано")
+        if self._session_salt is None:
+            self._session_salt = os.urandom(self.SALT_LENGTH)
+        # SDA всегда использует 50000 итераций и не читает поле encryption_iterations
+        key = self._derive_key(self._session_salt, self.KDF_ITERATIONS)
+        iv = os.urandom(self.IV_LENGTH)
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(plaintext.encode('utf-8')) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+        encrypted = encryptor.update(padded) + encryptor.finalize()
+        entry = {'encryption_iv': base64.b64encode(iv).decode(),
+                 'encryption_salt': base64.b64encode(self._session_salt).decode()}
+        return base64.b64encode(encrypted).decode(), entry
+
+    def unlock(self, password):
+        """Проверка пароля расшифровкой одного файла; ключи дальше берутся из кэша
+
+        Пароль принимается только после расшифровки настоящего шифротекста: файлы,
+        оставшиеся обычным JSON после прерванной миграции, для проверки не годятся.
+        """
+        self._require_crypto()
+        with self._lock:
+            self.load_manifest()
+            self._password = password.encode('utf-8')
+            self._keys = {}
+            for filename, entry in self._entries.items():
+                if not self.is_encrypted_file(filename):
+                    continue
+                try:
+                    with open(os.path.join(self.accounts_dir, filename), 'r', encoding='utf-8') as f:
+                        text = f.read()
+                except FileNotFoundError:
+                    continue
+                if text.lstrip().startswith('{'):
+                    continue
+                try:
+                    json.loads(self._decrypt(text, entry))
+                    return True
+                except Exception:
+                    break
+            self._password = None
+            self._keys = {}
+            return False
+
+    def lock(self):
+        with self._lock:
+            self._password = None
+            self._keys = {}
+            self._session_salt = None
+
+    def read_document(self, path):
+        """Расшифровка одного maFile (незашифрованные читаются как обычный JSON)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        entry = self._entries.get(os.path.basename(path))
+        # Файл, еще не замененный шифрованным при прерванной миграции, остается обычным JSON
+        if not self.is_encrypted_file(os.path.basename(path)) or text.lstrip().startswith('{'):
+            return json.loads(text)
+        with self._lock:
+            return json.loads(self._decrypt(text, entry))
+
+    def _save_manifest(self, manifest):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(manifest, indent=2))
+        os.replace(temp_path, self.manifest_path)
+        self._manifest_mtime = None
+        self.load_manifest()
+
+    @staticmethod
+    def _write_text(path, text):
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def _encrypt_document(self, path, document):
+        """Шифрованный текст maFile и его запись в манифесте"""
+        text, entry = self._encrypt(json.dumps(document, ensure_ascii=False))
+        steamid = document.get('steamid') or (document.get('Session') or {}).get('SteamID')
+        entry['filename'] = os.path.basename(path)
+        entry['steamid'] = int(steamid) if str(steamid or '').isdigit() else 0
+        return text, entry
+
+    def _save_entries(self, entries):
+        """Замена записей манифеста для перечисленных файлов одним сохранением"""
+        manifest = dict(self.load_manifest())
+        filenames = {entry['filename'] for entry in entries}
+        manifest['entries'] = [item for item in manifest.get('entries') or []
+                               if item.get('filename') not in filenames] + list(entries)
+        self._save_manifest(manifest)
+
+    def write_document(self, path, document):
+        """Атомарная запись зашифрованного maFile и его записи в манифесте"""
+        with self._lock:
+            text, entry = self._encrypt_document(path, document)
+            # Сначала манифест: файл с JSON внутри все равно читается как незашифрованный
+            self._save_entries([entry])
+            self._write_text(path, text)
+
+    def write_documents(self, documents):
+        """Запись пачки зашифрованных maFiles [(путь, документ)] с одним сохранением манифеста
+
+        Возвращает ошибки {путь: текст ошибки}; остальные файлы записываются.
+        """
+        errors = {}
+        with self._lock:
+            encrypted = []
+            for path, document in documents:
+                try:
+                    encrypted.append((path,) + self._encrypt_document(path, document))
+                except Exception as e:
+                    errors[path] = str(e)
+            if not encrypted:
+                return errors
+            self._save_entries([entry for _, _, entry in encrypted])
+            for path, text, _ in encrypted:
+                try:
+                    self._write_text(path, text)
+                except Exception as e:
+                    errors[path] = str(e)
+        return errors
+
+    def encrypt_files(self, password, paths, on_progress=None):
+        """Перевод незашифрованных maFiles в хранилище с паролем
+
+        Шифрованные копии пишутся во временные файлы, затем сохраняется манифест
+        и файлы заменяются; прерванная миграция оставляет читаемые файлы.
+        Нечитаемые maFiles пропускаются и остаются как есть.
+        Возвращает ошибки {имя файла: текст ошибки}.
+        """
+        self._require_crypto()
+        errors = {}
+        with self._lock:
+            self._password = password.encode('utf-8')
+            self._keys = {}
+            self._session_salt = None
+            manifest = dict(self.load_manifest())
+            entries = {entry.get('filename'): entry for entry in manifest.get('entries') or []}
+            pending = []
+            temp_paths = []
+            try:
+                for done, path in enumerate(paths, 1):
+                    temp_path = f"{path}.encrypt.tmp"
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            document = json.load(f)
+                        if not isinstance(document, dict):
+                            raise ValueError("неверный формат maFile")
+                        text, entry = self._encrypt_document(path, document)
+                        temp_paths.append(temp_path)
+                        with open(temp_path, 'w', encoding='utf-8') as f:
+                            f.write(text)
+                    except Exception as e:
+                        errors[os.path.basename(path)] = str(e)
+                    else:
+                        entries[entry['filename']] = entry
+                        pending.append((temp_path, path))
+                    if on_progress:
+                        on_progress(done, len(paths))
+                if not pending:
+                    return errors
+                manifest.setdefault('first_run', False)
+                manifest.setdefault('periodic_checking', False)
+                manifest.setdefault('periodic_checking_interval', 5)
+                manifest.setdefault('periodic_checking_checkall', False)
+                manifest.setdefault('auto_confirm_market_transactions', False)
+                manifest.setdefault('auto_confirm_trades', False)
+                manifest['encrypted'] = True
+                manifest['entries'] = list(entries.values())
+                self._save_manifest(manifest)
+                for temp_path, path in pending:
+                    try:
+                        os.replace(temp_path, path)
+                    except OSError as e:
+                        # Файл остается обычным JSON и читается как незашифрованный
+                        errors[os.path.basename(path)] = str(e)
+            finally:
+                # Замененные файлы уже переименованы, остальные копии удаляются
+                for temp_path in temp_paths:
+                    try:
+                        os.remove(temp_path)
+                    except FileNotFoundError:
+                        pass
+        return errors
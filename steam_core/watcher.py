@@ -0,0 +1,141 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from threading import Thread
+
+class AccountsWatcher:
+    """Отслеживание добавления, изменения и удаления maFiles в каталоге аккаунтов
+
+    На Linux используется inotify, на остальных системах - опрос снимка mtime/size.
+    on_change(changed, removed) вызывается из потока наблюдателя с множествами имен файлов;
+    on_change(None, None) означает, что события потеряны и нужна полная перезагрузка.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directory, on_change, poll_interval=2.0, debounce=0.3):
+        self.directory = directory
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск наблюдения в фоновом потоке"""
+        if self._thread is not None:
+            return
+        inotify_fd = self._init_inotify()
+        if inotify_fd is not None:
+            self.backend = "inotify"
+            target, args = self._inotify_loop, (inotify_fd,)
+        else:
+            self.backend = "poll"
+            target, args = self._poll_loop, ()
+        self._thread = Thread(target=target, args=args, daemon=True)
+        self._thread.start()
+        print(f"Наблюдение за {self.directory}: {self.backend}")
+
+    def stop(self):
+        """Остановка наблюдения"""
+        self._stop.set()
+
+    @staticmethod
+    def _is_account_file(name):
+        return name.endswith('.maFile')
+
+    def _init_inotify(self):
+        """Создание inotify-дескриптора через libc; None, если inotify недоступен"""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+            if fd < 0:
+                return None
+            mask = (self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                    | self.IN_DELETE | self.IN_DELETE_SELF)
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except Exception as e:
+            print(f"inotify недоступен: {e}")
+            return None
+
+    def _inotify_loop(self, fd):
+        """Чтение событий inotify; события за debounce секунд объединяются в одно уведомление"""
+        changed, removed = set(), set()
+        try:
+            while not self._stop.is_set():
+                timeout = self.debounce if changed or removed else 1.0
+                ready, _, _ = select.select([fd], [], [], timeout)
+                if not ready:
+                    if changed or removed:
+                        self.on_change(changed, removed)
+                        changed, removed = set(), set()
+                    continue
+                data = os.read(fd, 65536)
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                    offset += self.EVENT_HEADER.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    if mask & self.IN_Q_OVERFLOW:
+                        changed, removed = set(), set()
+                        self.on_change(None, None)
+                    elif mask & self.IN_DELETE_SELF:
+                        return
+                    elif not self._is_account_file(name):
+                        continue
+                    elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        changed.discard(name)
+                        removed.add(name)
+                    else:
+                        removed.discard(name)
+                        changed.add(name)
+        except Exception as e:
+            print(f"Ошибка наблюдения inotify: {e}")
+        finally:
+            os.close(fd)
+
+    def _snapshot(self):
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if self._is_account_file(entry.name):
+                    try:
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        pass
+        return snapshot
+
+    def _poll_loop(self):
+        """Опрос каталога и сравнение снимков"""
+        try:
+            previous = self._snapshot()
+        except OSError as e:
+            print(f"Ошибка наблюдения за каталогом: {e}")
+            return
+        while not self._stop.wait(self.poll_interval):
+            try:
+                current = self._snapshot()
+            except OSError:
+                continue
+            changed = {name for name, stat in current.items() if previous.get(name) != stat}
+            removed = previous.keys() - current.keys()
+            previous = current
+            if changed or removed:
+                self.on_change(changed, set(removed))